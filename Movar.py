@@ -18,8 +18,26 @@ along with Movar. If not, see <https://www.gnu.org/licenses/>.
 """
 
 from Movar.movar_application import Application
+from Movar.movar_models import convert_dictionary_to_bundle, SettingsModel
+from Movar.movar_database import import_dictionaries
+from multiprocessing import freeze_support
+import sys
 
 def main():
+  freeze_support()
+  #Movar.py --convert dictionary.txt ... створює пакунки .movar
+  if sys.argv[1:2] == ['--convert']:
+    for filepath in sys.argv[2:]:
+      print(convert_dictionary_to_bundle(filepath))
+    return
+  #Movar.py --import [словник чи тека ...] заносить словники до бази
+  #даних; без аргументів імпортуються всі розташування з налаштувань
+  if sys.argv[1:2] == ['--import']:
+    paths = sys.argv[2:] or \
+      SettingsModel().fields['location']['value'].splitlines()
+    for filepath, result in import_dictionaries(paths):
+      print(f'{filepath}: {result}')
+    return
   app = Application()
   app.mainloop()
 
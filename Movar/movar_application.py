@@ -21,16 +21,25 @@ along with Movar. If not, see <https://www.gnu.org/licenses/>.
 import tkinter as tk
 from tkinter import ttk, scrolledtext, font, messagebox
 from .movar_widgets import GenericMenu, TopWindow, FrameWindow
-from .movar_models import SettingsModel, TextSearch
+from .movar_models import SettingsModel, TextSearch, read_article
+from .movar_models import dictionary_resident_size, CompressedBody
+from .movar_models import AutocompleteSearch, DictionaryWatcher
+from .movar_database import open_dictionary_database
 from .movar_views import ColorStyles
 from .movar_widgets import get_main_menu_for_os
 from .movar_language_support import InterfaceLanguage
-import platform, ast, time, re
+import platform, ast, os, time
 from queue import Queue
+from types import MappingProxyType
 
 class Application(tk.Tk):
     """Головне вікно програми Movar."""
     
+    #Затримка (мс) перед пошуком варіантів автодоповнення
+    autocomplete_delay = 150
+    #Затримка (мс) перед фоновим завантаженням решти словників
+    warming_delay = 3000
+    
     def __init__(self, *args, **kwargs):
         """Ініціалізація атрибутів."""
         super().__init__(*args, **kwargs)
@@ -55,13 +64,26 @@ class Application(tk.Tk):
         
         self.word = tk.StringVar()
         
-        #Завантаження словників та префіксного дерева
-        self._download_dictionaries_and_index_tree()
+        #Словники з'являються тут у міру їх завантаження
+        self.total_dict = dict()
+        self.dictionary_catalog = dict()
+        self.failed_files = dict()
+        self.evicted_dicts = set()
+        self.slow_access_files = set()
+        self.dictionary_usage = dict()
+        self.index_search = dict()
+        self.selected_index = self.index_search
+        self.searcher = None
+        self.loading_applied = True
+        self.lookup_pending = False
+        self.watcher = None
+        self.watcher_queue = Queue()
+        self.database = None
         
         #Створення головного меню
         self.menu_class = get_main_menu_for_os(platform.system())
         self.menu = self.menu_class(
-            self, self.settings, self.total_dict)
+            self, self.settings, self.dictionary_catalog)
         self.configure(menu=self.menu)
         
         self.tts_player_value = self.menu.tts_player_var
@@ -92,6 +114,13 @@ class Application(tk.Tk):
         
         self._tracing_variables()
         
+        self._start_autocomplete_search()
+        
+        #Завантаження словників та префіксного дерева
+        self._download_dictionaries_and_index_tree()
+        
+        self._check_watcher_queue()
+        
     def _download_color_styles(self):
         """Завантаження кольорових схем."""
         self.color_styles = ColorStyles(self, self.settings)
@@ -152,6 +181,21 @@ class Application(tk.Tk):
             )
         self.dicts_option_menu.grid(row=0, column=0, sticky='w')
         
+        #Створення лінії прогресу та напису зі словниками,
+        #що ще завантажуються
+        self.progr_bar = ttk.Progressbar(self.search_frame,
+            mode='determinate',
+            orient=tk.HORIZONTAL,
+            style="LabeledProgressbar"
+            )
+        self.progr_bar.grid(row=1, column=0, columnspan=4, sticky='we')
+        self.progr_bar.grid_remove()
+        self.loading_status = ttk.Label(self.search_frame,
+            style='NewLabel.TLabel')
+        self.loading_status.grid(row=2, column=0, columnspan=4,
+            sticky='we')
+        self.loading_status.grid_remove()
+        
         self._choose_dictionaries_groups_for_search()
         
         #Створення горішнього вікна Toplevel для розміщення Listbox
@@ -164,7 +208,9 @@ class Application(tk.Tk):
         self.listbox_menu = tk.Listbox(
             self.top_window,
             selectbackground=self.bg_style['activebackground'],
-            yscrollcommand=self.yScroll.set)
+            yscrollcommand=self._listbox_scroll)
+        self.listbox_data = []
+        self.listbox_loaded = 0
             
         self.yScroll['command'] = self.listbox_menu.yview
         
@@ -222,65 +268,380 @@ class Application(tk.Tk):
         self.play_word_button_label = \
             translations[selected_language]['Play word']
         
-    def _show_progress_bar(self):
-        """Зображення лінії прогресу під час виконання завантаження."""
-        translations = self.language_options
-        selected_language = self.settings['language'].get()
-        pb_text = \
-            translations[selected_language]['Processing dictionaries']
-        self.color_styles.configure("LabeledProgressbar", text=pb_text)
-        self.top_bar = tk.Toplevel()
-        self.top_bar.configure(background =\
-            self.bg_style['activebackground'])
-        
-        self.progr_bar = ttk.Progressbar(self.top_bar,
-            mode='indeterminate',
-            length=500,
-            orient=tk.HORIZONTAL,
-            style="LabeledProgressbar"
-            )
-        self.progr_bar.grid(row=0, sticky='we')
-        self.progr_bar.start()
-        self.wait_visibility(self.top_bar)
-        while self.queue.empty():
-            self.progr_bar['value'] += 20
-            self.top_bar.update_idletasks()
-            time.sleep(0.25)
-            
     def _download_dictionaries_and_index_tree(self, *_):
-        """Завантаження словників."""
-        #Завантаження словників
+        """Завантаження словників після зміни їх розташувань."""
         self._save_settings()
-        searcher = TextSearch(self.queue)
-        searcher.start()
-        self._show_progress_bar()
-        self.total_dict = searcher.total_dict
-        
-        #Завантаження префіксного дерева
-        self.index_search = dict()
-        self.selected_index = dict()
-        for key in self.total_dict.keys():
-            if self.total_dict[key].get('Indexes'):
-                self.index_search[key] = self.total_dict[key]['Indexes']
-
-        if self.total_dict:
-            total_list = ""
-            for key in self.total_dict.keys():
-                lang_pair = self.total_dict[key]['Language pair']
-                total_list += key + f'({lang_pair})\n'
-            self.settings['active dicts'].set(total_list)
-        else:
-            self.settings['active dicts'].set('')
+        self._start_dictionary_watcher()
+        self._open_dictionary_database()
+        self.failed_files = dict()
+        self._load_dictionaries_in_background()
+        
+    def _load_dictionaries_in_background(self, changed_files=(),
+        warm=False):
+        """Завантаження словників у фоновому потоці.
+        
+        Уже завантажені словники лишаються в пам'яті: фоновий потік
+        обробляє лише нові та змінені файли, а словники з вилучених
+        розташувань не потрапляють до нового знімка. Незавершене
+        попереднє завантаження скасовується. У лінивому режимі
+        завантажуються лише словники поточної групи, а решта —
+        під час фонового прогріву (warm)."""
+        changed_files = set(changed_files)
+        for filepath in changed_files:
+            self.failed_files.pop(filepath, None)
+        if self.searcher:
+            self.searcher.cancel()
+            #Попереднє завантаження могло завершитися, а його знімок
+            #ще не прочитано з черги: тоді його зміни теж повторюються
+            if not self.loading_applied:
+                changed_files |= self.searcher.changed_files
+        self.loading_applied = False
+        self.loading_files = []
+        self.loading_sizes = dict()
+        self.loading_bytes = dict()
+        self.loading_headwords = dict()
+        self.loading_size = 0
+        self.loading_current = None
+        self.loading_started = time.monotonic()
+        self.load_report = dict()
+        self.load_failures = []
+        self.queue = Queue()
+        titles = None if warm else self._selected_dictionary_titles()
+        self.searcher = TextSearch(self.queue, self.total_dict,
+            changed_files, titles, self.database, self.failed_files,
+            self.evicted_dicts)
+        self.searcher.start()
+        self._check_loading_queue(self.queue)
+        
+    def _selected_dictionary_titles(self):
+        """Назви словників, які потрібно завантажити для пошуку.
+        
+        None означає всі словники: так буває без лінивого режиму
+        або коли вибрано групу всіх словників."""
+        if not self.settings['lazy loading'].get():
+            return None
+        return self._group_dictionary_titles()
+        
+    def _group_dictionary_titles(self):
+        """Назви словників поточної групи (None — група всіх словників)."""
+        dict_group_name = self.dict_main_var.get()
+        if dict_group_name == self.dict_groups_options[0] or \
+            not self.settings['dict groups'].get():
+            return None
+        dict_groups = ast.literal_eval(self.settings['dict groups'].get())
+        return {dic.split("(")[0]
+            for dic in dict_groups.get(dict_group_name, [])}
+            
+    def _missing_dictionaries(self, titles=None):
+        """Назви словників з переліку, які ще не завантажено."""
+        return {title for title, header in self.dictionary_catalog.items()
+            if (titles is None or title in titles) and \
+            title not in self.total_dict and \
+            header['File path'] not in self.failed_files}
+            
+    def _touch_dictionaries(self, titles):
+        """Позначення словників, з яких щойно прочитано статті,
+        як щойно використаних."""
+        for title in titles:
+            self.dictionary_usage.pop(title, None)
+            self.dictionary_usage[title] = True
+            
+    def _resident_sizes(self):
+        """Обсяг пам'яті, який зараз займає кожен словник.
         
+        Обсяг обчислюється щоразу наново, бо кеші розпакованих блоків
+        стиснутих словників ростуть під час читання статей."""
+        return {title: dictionary_resident_size(dict_data)
+            for title, dict_data in self.total_dict.items()}
+            
+    def _memory_budget_exceeded(self, resident_sizes=None):
+        """Перевірка, чи словники займають більше пам'яті, ніж дозволено."""
+        budget = self.settings['memory budget'].get() * 1024 * 1024
+        if budget <= 0:
+            return False
+        if resident_sizes is None:
+            resident_sizes = self._resident_sizes()
+        return budget < sum(resident_sizes.values())
+        
+    def _enforce_memory_budget(self):
+        """Вивантаження давно не використаних словників.
+        
+        Словники вивантажуються від найдавніше використаних для
+        пошуку статей, доки не вмістяться в бюджет пам'яті, зокрема
+        й словники поточної групи. Вивантажений словник знову
+        завантажується (зазвичай з кешу індексів) під час наступного
+        пошуку статті (_reload_evicted_dictionaries)."""
+        resident_sizes = self._resident_sizes()
+        if not self._memory_budget_exceeded(resident_sizes):
+            return
+        usage_order = {title: position for position, title
+            in enumerate(self.dictionary_usage)}
+        candidates = sorted(self.total_dict,
+            key=lambda title: usage_order.get(title, -1))
+        budget = self.settings['memory budget'].get() * 1024 * 1024
+        resident = sum(resident_sizes.values())
+        evicted = set()
+        for title in candidates:
+            if resident <= budget:
+                break
+            resident -= resident_sizes[title]
+            evicted.add(title)
+        if evicted:
+            self.evicted_dicts |= evicted
+            self._publish_dictionaries(MappingProxyType(
+                {title: dict_data
+                for title, dict_data in self.total_dict.items()
+                if title not in evicted}))
+            
+    def _reload_evicted_dictionaries(self):
+        """Завантаження вивантажених словників поточної групи.
+        
+        Коли словники завантажаться, пошук статті повторюється.
+        Повертає True, якщо завантаження почалося."""
+        group_titles = self._group_dictionary_titles()
+        titles = set(self.evicted_dicts) if group_titles is None \
+            else self.evicted_dicts & group_titles
+        if not titles:
+            return False
+        self.evicted_dicts -= titles
+        #Щойно завантажені словники не мають вивантажитися першими
+        self._touch_dictionaries(titles)
+        self.lookup_pending = True
+        self._load_dictionaries_in_background()
+        return True
+        
+    def _load_selected_dictionaries(self):
+        """Завантаження словників поточної групи, яких ще немає."""
+        if not self.dictionary_catalog:
+            return
+        #Вивантажені словники повертаються лише під час пошуку статті,
+        #інакше вивантаження й завантаження чергувалися б без кінця
+        missing = self._missing_dictionaries(
+            self._selected_dictionary_titles()) - self.evicted_dicts
+        if not missing:
+            return
+        if self.searcher and self.searcher.is_alive() and \
+            not self.searcher.cancel_event.is_set() and \
+            (self.searcher.titles is None or
+            missing <= self.searcher.titles):
+            return
+        self._load_dictionaries_in_background()
+        
+    def _warm_dictionaries(self):
+        """Фонове завантаження решти словників, поки програма вільна."""
+        if self.searcher and self.searcher.is_alive():
+            return
+        if self._memory_budget_exceeded():
+            return
+        if self._missing_dictionaries() - self.evicted_dicts:
+            self._load_dictionaries_in_background(warm=True)
+        
+    def _open_dictionary_database(self):
+        """Відкриття бази даних імпортованих словників.
+        
+        База відкривається лише для читання, тож її можуть водночас
+        використовувати кілька копій програми."""
+        if not self.settings['dictionary database'].get():
+            self.database = None
+        elif self.database is None:
+            self.database = open_dictionary_database()
+            
+    def _start_dictionary_watcher(self):
+        """Запуск стеження за змінами в теках словників."""
+        if self.watcher:
+            self.watcher.stop()
+            self.watcher = None
+        if self.settings['watch dictionaries'].get():
+            paths = self.settings['location'].get().splitlines()
+            self.watcher = DictionaryWatcher(self.watcher_queue, paths)
+            self.watcher.start()
+            
+    def _check_watcher_queue(self):
+        """Перезавантаження словників, файли яких змінилися."""
+        changed_files = set()
+        while not self.watcher_queue.empty():
+            changed_files |= self.watcher_queue.get()['files']
+        if changed_files:
+            self._load_dictionaries_in_background(changed_files)
+        self.after(500, self._check_watcher_queue)
+        
+    def _check_loading_queue(self, queue):
+        """Обробка подій завантаження словників.
+        
+        Викликається з головного потоку через after(), тож усі
+        звернення до Tk відбуваються лише тут."""
+        if queue is not self.queue:
+            return
+        snapshot = None
+        done = False
+        cancelled = False
+        while not queue.empty():
+            message = queue.get()
+            event = message['event']
+            if event == 'loading started':
+                self.loading_files = list(message['files'])
+                self.loading_size = message['size']
+            elif event in ('file started', 'bytes read',
+                'headwords indexed') and \
+                message['file'] not in self.loading_files:
+                #Події ходу з процесів-виконавців ідуть окремою чергою
+                #і можуть прийти вже після звіту про весь файл
+                continue
+            elif event == 'file started':
+                self.loading_current = message['file']
+                self.loading_sizes[message['file']] = message['size']
+                self.loading_bytes[message['file']] = 0
+            elif event == 'bytes read':
+                self.loading_bytes[message['file']] = message['bytes']
+            elif event == 'headwords indexed':
+                self.loading_headwords[message['file']] = \
+                    message['headwords']
+            elif event in ('file done', 'file failed'):
+                self.loading_bytes[message['file']] = message['size']
+                if message['file'] in self.loading_files:
+                    self.loading_files.remove(message['file'])
+                self.load_report[message['file']] = message['report']
+                if event == 'file failed':
+                    self.load_failures.append(message['file'])
+                    self.failed_files[message['file']] = message['stat']
+            elif event == 'catalog':
+                self._publish_dictionary_catalog(message['catalog'])
+            elif event == 'snapshot':
+                snapshot = message['snapshot']
+            elif event == 'done':
+                done = True
+                cancelled = message['cancelled']
+                
+        if done:
+            self.loading_applied = not cancelled
+        if snapshot is not None:
+            self._publish_dictionaries(snapshot)
+            #Новий знімок міг одразу почати наступне завантаження
+            if queue is not self.queue:
+                return
+        if done:
+            self.loading_files = []
+            #Пошук, що чекав на вивантажені словники, повторюється
+            if not cancelled and self.lookup_pending:
+                self.lookup_pending = False
+                self._text_widget_insert(reload=False)
+            if not cancelled and \
+                self.settings['lazy loading'].get() and \
+                self.settings['background warming'].get() and \
+                self._missing_dictionaries() - self.evicted_dicts:
+                self.after(self.warming_delay, self._warm_dictionaries)
+        self._show_loading_status()
+        if done and self.load_failures:
+            self._show_download_mistakes(self.load_failures)
+        if done and not cancelled:
+            self._show_slow_access_warning()
+        if not done:
+            self.after(100, self._check_loading_queue, queue)
+            
+    def _show_download_mistakes(self, filepaths):
+        """Показати помилки завантаження всіх зламаних словників."""
+        language = self.settings['language'].get()
+        translations = self.language_options[language]
+        messages = []
+        for filepath in filepaths:
+            report = self.load_report[filepath]
+            filename = os.path.basename(filepath)
+            if report['error type'] == 'regex':
+                messages.append(translations['Regex mistake'] +
+                    filename + '\n' + report['error'] + '!')
+            elif report['error type'] == 'format':
+                messages.append(translations['Dict download mistake'] +
+                    filename + '!')
+            else:
+                messages.append(translations['Dict download mistake'] +
+                    filename + '!\n' + report['error'])
+        title = translations['Title dict download mistake']
+        messagebox.showwarning(title, '\n\n'.join(messages))
+            
+    def _show_slow_access_warning(self):
+        """Попередити один раз про стиснуті словники, статті яких
+        можна читати лише від початку файла."""
+        filepaths = [dict_data['File path']
+            for dict_data in self.total_dict.values()
+            if isinstance(dict_data.get('Main body'), CompressedBody) and
+            dict_data['Main body'].sequential_only() and
+            dict_data['File path'] not in self.slow_access_files]
+        if not filepaths:
+            return
+        self.slow_access_files.update(filepaths)
+        language = self.settings['language'].get()
+        translations = self.language_options[language]
+        message = translations['Slow access'] + '\n'.join(
+            os.path.basename(filepath) for filepath in filepaths)
+        messagebox.showwarning(translations['Title slow access'], message)
+            
+    def _publish_dictionaries(self, snapshot):
+        """Заміна переліку словників новим знімком.
+        
+        Знімок не змінюється після публікації, а переліки для пошуку
+        створюються наново, тож фоновий пошук завжди працює
+        з цілісною копією."""
+        self.total_dict = snapshot
+        self.evicted_dicts -= set(snapshot)
+        self.index_search = {key: dict_data['Prefix index']
+            for key, dict_data in self.total_dict.items()}
         self.selected_index = self.index_search
-        
-        self.queue.get()
-        self.progr_bar.stop()
-        self.top_bar.withdraw()
+        self._choose_dictionaries_groups_for_search()
+        self._enforce_memory_budget()
+        
+    def _publish_dictionary_catalog(self, catalog):
+        """Оновлення переліку наявних словників у налаштуваннях.
+        
+        Перелік складається із заголовків файлів, тож словники
+        з'являються в ньому ще до свого завантаження."""
+        self.dictionary_catalog = catalog
+        self.menu.total_dict = catalog
+        
+        total_list = ""
+        for key in catalog.keys():
+            lang_pair = catalog[key]['Language pair']
+            total_list += key + f'({lang_pair})\n'
+        self.settings['active dicts'].set(total_list)
+        if hasattr(self.menu, 'total_dict_list') and \
+            self.menu.total_dict_list.winfo_exists():
+            self.menu._set_active_dictionary_list()
+        
+    def _show_loading_status(self):
+        """Показ ходу завантаження та словників, що ще завантажуються."""
+        if self.loading_files:
+            translations = self.language_options
+            selected_language = self.settings['language'].get()
+            status_text = \
+                translations[selected_language]['Processing dictionaries']
+            
+            bytes_read = sum(self.loading_bytes.values())
+            elapsed = time.monotonic() - self.loading_started
+            rate = bytes_read / max(elapsed, 0.001) / 1024 / 1024
+            pb_text = f'{status_text} {rate:.1f} MB/s'
+            if self.loading_current:
+                pb_text = f'{os.path.basename(self.loading_current)}' \
+                    f' — {pb_text}'
+                headwords = \
+                    self.loading_headwords.get(self.loading_current)
+                if headwords:
+                    pb_text += f' ({headwords})'
+            self.color_styles.configure("LabeledProgressbar",
+                text=pb_text)
+            self.progr_bar['value'] = \
+                100 * bytes_read / max(self.loading_size, 1)
+            self.progr_bar.grid()
+            
+            file_names = ', '.join(os.path.basename(filepath)
+                for filepath in self.loading_files)
+            self.loading_status.configure(
+                text=f'{status_text}: {file_names}')
+            self.loading_status.grid()
+        else:
+            self.progr_bar.grid_remove()
+            self.loading_status.grid_remove()
             
     def _choose_dictionaries_groups_for_search(self, *_):
         """Встановлення поточної групи словників."""
-        self.menu.total_dict = self.total_dict
         if self.dict_main_var.get() not in self.dict_groups_options:
             self.dict_main_var.set(self.dict_groups_options[0])
         dict_group_name = self.dict_main_var.get()
@@ -294,15 +655,18 @@ class Application(tk.Tk):
             else:
                 for dic in dict_groups[dict_group_name]:
                     dic = dic.split("(")[0]
-                    self.selected_index[dic] = self.index_search[dic]
+                    if dic in self.index_search:
+                        self.selected_index[dic] = \
+                            self.index_search[dic]
             self.settings['default dict group'].set(dict_group_name)
+        self._load_selected_dictionaries()
 
     def _on_style_change(self, *_):
         """Зміна кольорового стилю оформлення."""
         self._download_color_styles()
         self.menu_class = get_main_menu_for_os(platform.system())
         self.menu = self.menu_class(
-            self, self.settings, self.total_dict)
+            self, self.settings, self.dictionary_catalog)
         self.configure(menu=self.menu)
         
         self.dicts_option_menu['menu'].configure(
@@ -330,7 +694,7 @@ class Application(tk.Tk):
         
         self.menu_class = get_main_menu_for_os(platform.system())
         self.menu = self.menu_class(
-            self, self.settings, self.total_dict)
+            self, self.settings, self.dictionary_catalog)
         self.configure(menu=self.menu)
     
     def _on_language_change(self, *_):
@@ -373,6 +737,7 @@ class Application(tk.Tk):
         self.word_entry.bind('<KeyRelease>', self._key_press)
         self.word_entry.bind('<Down>', self._listbox_focus)
         self.word_entry.bind('<Return>', self._text_widget_insert)
+        self.word_entry.bind('<Shift-Return>', self._full_text_search)
         
         self.listbox_menu.bind('<KeyPress>', self._entry_focus)
         self.listbox_menu.bind('<ButtonRelease-1>', self._listbox_focus)
@@ -621,35 +986,72 @@ class Application(tk.Tk):
                     engine.say(word)
                 engine.runAndWait()
             
+    def _start_autocomplete_search(self):
+        """Запуск фонового пошуку варіантів автодоповнення."""
+        self.autocomplete_queue = Queue()
+        self.autocomplete_job = None
+        self.autocomplete = AutocompleteSearch(self.autocomplete_queue)
+        self.autocomplete.start()
+        self._check_autocomplete_results()
+        
     def _key_press(self, event):
         """Стеження за натиснутою кнопкою клавіатури."""
         key = event.widget.get()
         self.search_history.selection_clear(0, tk.END)
+        if self.autocomplete_job:
+            self.after_cancel(self.autocomplete_job)
+            self.autocomplete_job = None
         if key == "":
-            data = []
+            self.autocomplete.latest_query_id += 1
             self.top_window.withdraw()
         elif key != '' and event.keysym != 'Return':
-            data = []
-            self._listbox_search_menu_appears()
-            for dic in self.selected_index.keys():
-                for item in self.selected_index[dic]:
-                    clean_item = re.sub(r'\W', '', item)
-                    if (clean_item.lower().startswith(key.lower()) \
-                    or item.lower().startswith(key.lower())) \
-                    and item not in data:
-                        self.yScroll.grid(row=1, column=1,
-                            sticky='ns')
-                        self.listbox_menu.grid(row=1, column=0,
-                            sticky="we")
-                        data.append(item)
-            self._listbox_search_words_update(data)
+            self.autocomplete_job = self.after(self.autocomplete_delay,
+                self._submit_autocomplete_query, key)
+                
+    def _submit_autocomplete_query(self, key):
+        """Передача запиту фоновому пошуку автодоповнення."""
+        self.autocomplete_job = None
+        self.autocomplete.submit(key, self.selected_index)
+        
+    def _check_autocomplete_results(self):
+        """Отримання найновіших результатів автодоповнення."""
+        result = None
+        while not self.autocomplete_queue.empty():
+            result = self.autocomplete_queue.get()
+        if result:
+            query_id, key, data = result
+            if query_id == self.autocomplete.latest_query_id and \
+                key == self.word.get():
+                self._listbox_search_menu_appears()
+                if data:
+                    self.yScroll.grid(row=1, column=1, sticky='ns')
+                    self.listbox_menu.grid(row=1, column=0,
+                        sticky="we")
+                self._listbox_search_words_update(data)
+        self.after(50, self._check_autocomplete_results)
     
     def _listbox_search_words_update(self, data):
         """Оновлення слів у Listbox_menu"""
         self.listbox_menu.delete(0, 'end')
-        data = sorted(data, key=lambda x: re.sub(r'\W', '', x))
-        for item in data:
-            self.listbox_menu.insert('end', item)
+        self.listbox_data = data
+        self.listbox_loaded = 0
+        self._listbox_load_next_page()
+        
+    def _listbox_load_next_page(self):
+        """Додавання до Listbox_menu наступної сторінки слів."""
+        limit = max(1, self.settings['autocomplete limit'].get())
+        page = self.listbox_data[
+            self.listbox_loaded:self.listbox_loaded + limit]
+        if page:
+            self.listbox_menu.insert('end', *page)
+            self.listbox_loaded += len(page)
+            
+    def _listbox_scroll(self, first, last):
+        """Догортання Listbox_menu до кінця завантажує нові слова."""
+        self.yScroll.set(first, last)
+        if float(last) >= 1.0 and \
+            self.listbox_loaded < len(self.listbox_data):
+            self.after_idle(self._listbox_load_next_page)
         
     def _listbox_focus(self, event):
         """Вибір слова у випадному меню під пошуком слова"""
@@ -695,18 +1097,13 @@ class Application(tk.Tk):
             self._entry_insert_text(found_word) 
             self._text_widget_insert()
         
-    def _text_widget_insert(self, *_):
-        """Вивід результатів пошуку слова."""
+    def _selected_dictionary_set(self):
+        """Завантажені словники поточної групи."""
         translations = self.language_options
         selected_language = self.settings['language'].get()
-        no_word_label = translations[selected_language]['No word']
         all_dictionaries = \
             translations[selected_language]['All dictionaries']
         
-        self.search_results.configure(state='normal')
-        self.search_results.delete('1.0', 'end')
-        self.search_results.configure(state='disabled')
-        
         sel_dict_set = dict()
         dict_group_name = self.dict_main_var.get()
         
@@ -726,25 +1123,36 @@ class Application(tk.Tk):
                 sel_dict_set = self.total_dict
         else:
             sel_dict_set = self.total_dict
-                    
+        return sel_dict_set
+        
+    def _text_widget_insert(self, *_, reload=True):
+        """Вивід результатів пошуку слова.
+        
+        Якщо словники поточної групи вивантажено через бюджет пам'яті,
+        вони завантажуються знову (якщо reload), а пошук повторюється,
+        щойно вони будуть готові."""
+        translations = self.language_options
+        selected_language = self.settings['language'].get()
+        no_word_label = translations[selected_language]['No word']
+        
+        self.search_results.configure(state='normal')
+        self.search_results.delete('1.0', 'end')
+        self.search_results.configure(state='disabled')
+        
+        #Повертаються словники, вивантажені ще до цього пошуку
+        if reload:
+            self._reload_evicted_dictionaries()
+        sel_dict_set = self._selected_dictionary_set()
         count = len(sel_dict_set)
         word = self.word.get().lower()
         for key in sel_dict_set.keys():
             if word in sel_dict_set[key]['Indexes']:
-                start_article = sel_dict_set[key]['Indexes'][word][0]
-                found_word_index = list(
-                    sel_dict_set[key]['Indexes']).index(word)
-                if found_word_index < \
-                    (len(sel_dict_set[key]['Indexes']) - 1):
-                    next_word_index = found_word_index + 1
-                    end_article = sel_dict_set[key]['Indexes']\
-                        [list(sel_dict_set[key]['Indexes'])\
-                        [next_word_index]][0]
-                else:
-                    end_article = None
+                self._touch_dictionaries([key])
+                start_article, end_article = \
+                    sel_dict_set[key]['Indexes'][word]
                 
-                article = sel_dict_set[key]\
-                    ['Main body'][start_article:end_article]
+                article = read_article(sel_dict_set[key],
+                    start_article, end_article)
                 self._search_results_internal_frame(article, key)    
             else:
                 count -= 1
@@ -754,6 +1162,8 @@ class Application(tk.Tk):
                     self.search_results.insert('1.0',
                         f"{no_word_label} «{self.word.get()}».")
                     self.search_results.configure(state='disabled')
+        #Прочитані статті поповнюють кеші стиснутих словників
+        self._enforce_memory_budget()
             
         history = self.settings['history'].get().strip('\n')
         history_list = list(history.split('\n'))
@@ -765,6 +1175,40 @@ class Application(tk.Tk):
                     
         self.top_window.withdraw()
         
+    def _full_text_search(self, *_):
+        """Вивід статей, що містять усі слова з поля пошуку.
+        
+        Шукаються лише словники, імпортовані до бази даних."""
+        translations = self.language_options
+        selected_language = self.settings['language'].get()
+        no_text_label = translations[selected_language]['No text']
+        
+        self.search_results.configure(state='normal')
+        self.search_results.delete('1.0', 'end')
+        self.search_results.configure(state='disabled')
+        
+        sel_dict_set = self._selected_dictionary_set()
+        dictionary_ids = [dict_data['Database id']
+            for dict_data in sel_dict_set.values()
+            if 'Database id' in dict_data]
+        found = []
+        if self.database is not None:
+            found = self.database.search_text(self.word.get(),
+                dictionary_ids,
+                max(1, self.settings['full text limit'].get()))
+        self._touch_dictionaries({title for title, _, _ in found})
+        #Кожна рамка вставляється на початок, тож найвідповідніша
+        #стаття додається останньою
+        for title, word, article in reversed(found):
+            self._search_results_internal_frame(article,
+                f'{title}: {word}')
+        if not found:
+            self.search_results.configure(state='normal')
+            self.search_results.insert('1.0',
+                f"{no_text_label} «{self.word.get()}».")
+            self.search_results.configure(state='disabled')
+        self.top_window.withdraw()
+        
     def _search_results_internal_frame(self, article, key):
         """Додавання результатів пошуку до внутрішньої рамки."""
         self.search_results.configure(state='normal')
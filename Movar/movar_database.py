@@ -0,0 +1,393 @@
+"""
+Copyright (C) 2023  Teg Miles
+
+This file is part of Movar.
+
+Movar is free software: you can redistribute it and/or modify it
+under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License,
+or any later version.
+
+Movar is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty
+of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Movar. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os, platform, sqlite3, sys
+from pathlib import Path
+from threading import Lock
+from collections.abc import Mapping
+from .movar_models import SettingsModel, load_dictionary_file
+from .movar_models import open_dictionary_body, read_article
+from .movar_models import headword_collation_key, headword_match_key
+from .movar_models import is_ukrainian_pair, scan_dictionary_files
+
+#Таблиці бази даних словників
+DATABASE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dictionaries (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    language_pair TEXT NOT NULL,
+    description TEXT NOT NULL,
+    file_path TEXT NOT NULL UNIQUE,
+    file_size INTEGER NOT NULL,
+    file_mtime INTEGER NOT NULL,
+    headwords INTEGER NOT NULL
+    );
+CREATE TABLE IF NOT EXISTS articles (
+    id INTEGER PRIMARY KEY,
+    dictionary_id INTEGER NOT NULL,
+    start_offset INTEGER NOT NULL,
+    end_offset INTEGER NOT NULL,
+    body TEXT NOT NULL
+    );
+CREATE UNIQUE INDEX IF NOT EXISTS articles_by_offset
+    ON articles (dictionary_id, start_offset);
+CREATE TABLE IF NOT EXISTS headwords (
+    dictionary_id INTEGER NOT NULL,
+    word TEXT NOT NULL,
+    collation_key TEXT NOT NULL,
+    clean_key TEXT NOT NULL,
+    match_key TEXT NOT NULL,
+    article_id INTEGER NOT NULL,
+    PRIMARY KEY (dictionary_id, word)
+    ) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS headwords_by_clean_key
+    ON headwords (dictionary_id, clean_key, collation_key, match_key);
+CREATE INDEX IF NOT EXISTS headwords_by_match_key
+    ON headwords (dictionary_id, match_key, collation_key, clean_key);
+"""
+
+#Повнотекстовий індекс статей (потрібна збірка SQLite з FTS5)
+FULL_TEXT_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS articles_text USING fts5(
+    body, content='articles', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+    );
+"""
+
+class DictionaryDatabase:
+    """Клас, що зберігає словники в базі даних SQLite.
+    
+    Словник імпортується один раз: заголовні слова з ключами
+    пошуку, межі статей у файлі й тексти статей записуються до
+    таблиць з індексами, тож пошук слова, пошук за початком слова
+    й повнотекстовий пошук виконуються запитами SQL, а відкриття
+    словника нічого не обчислює. Програма відкриває базу лише для
+    читання, тож її можуть одночасно використовувати кілька копій
+    Movar; записує до неї лише імпорт."""
+    
+    filename = 'movar_dictionaries.sqlite'
+    
+    def __init__(self, filepath=None, readonly=True):
+        """Ініціалізація атрибутів."""
+        if filepath is None:
+            filedir = SettingsModel.config_dirs.get(
+                platform.system(), Path.home())
+            filepath = filedir/self.filename
+        self.filepath = Path(filepath).absolute()
+        self.readonly = readonly
+        #Одне з'єднання на всі потоки, запити йдуть по черзі
+        self.lock = Lock()
+        if readonly:
+            self.connection = sqlite3.connect(
+                f'{self.filepath.as_uri()}?mode=ro', uri=True,
+                check_same_thread=False)
+        else:
+            self.filepath.parent.mkdir(parents=True, exist_ok=True)
+            self.connection = sqlite3.connect(self.filepath,
+                check_same_thread=False)
+            self.connection.executescript(DATABASE_SCHEMA)
+            try:
+                self.connection.executescript(FULL_TEXT_SCHEMA)
+            except sqlite3.OperationalError:
+                pass
+        self.full_text = self._has_full_text()
+        
+    def _has_full_text(self):
+        """Перевірка, чи є в базі робочий повнотекстовий індекс."""
+        try:
+            self.connection.execute(
+                "SELECT rowid FROM articles_text LIMIT 0")
+            return True
+        except sqlite3.OperationalError:
+            return False
+            
+    def query(self, sql, parameters=()):
+        """Виконання запиту й отримання всіх рядків результату."""
+        with self.lock:
+            return self.connection.execute(sql, parameters).fetchall()
+            
+    def close(self):
+        """Закриття з'єднання з базою."""
+        with self.lock:
+            self.connection.close()
+            
+    def is_current(self, filepath, stat):
+        """Перевірка, чи імпортовано словник з файла такого розміру
+        й часу зміни."""
+        try:
+            rows = self.query("SELECT file_size, file_mtime"
+                " FROM dictionaries WHERE file_path = ?",
+                (os.path.abspath(filepath),))
+        except sqlite3.Error:
+            #Пошкоджена чи недоступна база: словник читається з файла
+            return False
+        return bool(rows) and \
+            rows[0] == (stat.st_size, stat.st_mtime_ns)
+            
+    def import_file(self, filepath, progress=None):
+        """Імпорт словника з файла до бази даних.
+        
+        Словник завантажується й індексується так само, як під час
+        звичайного завантаження, а попередній імпорт того самого
+        файла замінюється. Повертає назву словника."""
+        title, dict_data = load_dictionary_file(filepath, progress)
+        if 'Main body' not in dict_data:
+            dict_data['Main body'] = open_dictionary_body(filepath)
+        ukrainian = is_ukrainian_pair(dict_data['Language pair'])
+        stat = os.stat(filepath)
+        #Шлях у базі завжди абсолютний, хоч би як його вказано
+        filepath = os.path.abspath(filepath)
+        with self.lock, self.connection:
+            self._delete_dictionary(filepath)
+            dictionary_id = self.connection.execute(
+                "INSERT INTO dictionaries (title, language_pair,"
+                " description, file_path, file_size, file_mtime,"
+                " headwords) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (title, dict_data['Language pair'],
+                dict_data['Description'], filepath, stat.st_size,
+                stat.st_mtime_ns, len(dict_data['Indexes']))).lastrowid
+            next_id = self.connection.execute(
+                "SELECT coalesce(max(id), 0) + 1 FROM articles"
+                ).fetchone()[0]
+            #Кілька слів можуть вести до однієї статті
+            article_ids = {}
+            for span in dict_data['Indexes'].values():
+                if span not in article_ids:
+                    article_ids[span] = next_id + len(article_ids)
+            self.connection.executemany(
+                "INSERT INTO articles (id, dictionary_id, start_offset,"
+                " end_offset, body) VALUES (?, ?, ?, ?, ?)",
+                ((article_id, dictionary_id, start, end,
+                read_article(dict_data, start, end))
+                for (start, end), article_id in article_ids.items()))
+            self.connection.executemany(
+                "INSERT INTO headwords (dictionary_id, word,"
+                " collation_key, clean_key, match_key, article_id)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                ((dictionary_id, word,
+                headword_collation_key(word, ukrainian),
+                headword_match_key(word, clean=True),
+                headword_match_key(word), article_ids[span])
+                for word, span in dict_data['Indexes'].items()))
+            if self.full_text:
+                self.connection.execute(
+                    "INSERT INTO articles_text (rowid, body)"
+                    " SELECT id, body FROM articles"
+                    " WHERE dictionary_id = ?", (dictionary_id,))
+        return title
+        
+    def _delete_dictionary(self, filepath):
+        """Вилучення попереднього імпорту файла (у відкритій
+        транзакції)."""
+        row = self.connection.execute(
+            "SELECT id FROM dictionaries WHERE file_path = ?",
+            (os.path.abspath(filepath),)).fetchone()
+        if row is None:
+            return
+        if self.full_text:
+            self.connection.execute(
+                "INSERT INTO articles_text (articles_text, rowid, body)"
+                " SELECT 'delete', id, body FROM articles"
+                " WHERE dictionary_id = ?", row)
+        for table in ('headwords', 'articles'):
+            self.connection.execute(
+                f"DELETE FROM {table} WHERE dictionary_id = ?", row)
+        self.connection.execute(
+            "DELETE FROM dictionaries WHERE id = ?", row)
+            
+    def remove_file(self, filepath):
+        """Вилучення словника з бази даних."""
+        with self.lock, self.connection:
+            self._delete_dictionary(filepath)
+            
+    def load_dictionary(self, filepath, progress=None):
+        """Відкриття імпортованого словника.
+        
+        Повертає назву й дані словника в тому ж вигляді, що й
+        load_dictionary_file, разом з тілом та індексом префіксів,
+        які читають дані з бази."""
+        rows = self.query("SELECT id, title, language_pair, description,"
+            " headwords FROM dictionaries WHERE file_path = ?",
+            (os.path.abspath(filepath),))
+        if not rows:
+            raise KeyError(filepath)
+        dictionary_id, title, language_pair, description, headwords = \
+            rows[0]
+        return title, {
+            'Language pair': language_pair,
+            'Description': description,
+            'Regex filter': '',
+            'File path': filepath,
+            'Database id': dictionary_id,
+            'Indexes': DatabaseIndex(self, dictionary_id, headwords),
+            'Main body': DatabaseBody(self, dictionary_id),
+            'Prefix index': DatabasePrefixIndex(self, dictionary_id,
+                headwords),
+            }
+            
+    def search_text(self, text, dictionary_ids, limit=50):
+        """Повнотекстовий пошук статей зі всіма словами text.
+        
+        Повертає трійки (назва словника, заголовне слово, стаття),
+        найвідповідніші статті першими."""
+        words = text.split()
+        if not self.full_text or not words or not dictionary_ids:
+            return []
+        #Кожне слово береться в лапки, тож символи мови запитів FTS5
+        #не мають особливого значення
+        match = ' '.join('"' + word.replace('"', '""') + '"'
+            for word in words)
+        placeholders = ', '.join('?' * len(dictionary_ids))
+        return self.query(
+            "SELECT dictionaries.title, (SELECT min(word) FROM headwords"
+            " WHERE headwords.dictionary_id = articles.dictionary_id"
+            " AND headwords.article_id = articles.id), articles.body"
+            " FROM articles_text"
+            " JOIN articles ON articles.id = articles_text.rowid"
+            " JOIN dictionaries ON dictionaries.id = articles.dictionary_id"
+            " WHERE articles_text MATCH ? AND articles.dictionary_id"
+            f" IN ({placeholders}) ORDER BY rank LIMIT ?",
+            (match, *dictionary_ids, limit))
+            
+class DatabaseIndex(Mapping):
+    """Індекс статей імпортованого словника: слово → межі статті.
+    
+    Замінює CompactIndex, але кожне звернення — запит до бази."""
+    
+    def __init__(self, database, dictionary_id, headwords):
+        """Ініціалізація атрибутів."""
+        self.database = database
+        self.dictionary_id = dictionary_id
+        self.headwords = headwords
+        
+    def __getitem__(self, word):
+        rows = self.database.query("SELECT start_offset, end_offset"
+            " FROM headwords JOIN articles ON articles.id = article_id"
+            " WHERE headwords.dictionary_id = ? AND word = ?",
+            (self.dictionary_id, word))
+        if not rows:
+            raise KeyError(word)
+        return rows[0]
+        
+    def __len__(self):
+        return self.headwords
+        
+    def __iter__(self):
+        rows = self.database.query("SELECT word FROM headwords"
+            " WHERE dictionary_id = ? ORDER BY word",
+            (self.dictionary_id,))
+        return (word for word, in rows)
+        
+    def resident_size(self):
+        """Обсяг пам'яті (байт): дані лишаються в базі."""
+        return sys.getsizeof(self)
+        
+class DatabaseBody:
+    """Тіло імпортованого словника.
+    
+    Статті зберігаються окремо, тож фрагмент body[start:end] має
+    збігатися з межами однієї статті з індексу."""
+    
+    def __init__(self, database, dictionary_id):
+        """Ініціалізація атрибутів."""
+        self.database = database
+        self.dictionary_id = dictionary_id
+        
+    def __getitem__(self, key):
+        rows = self.database.query("SELECT body FROM articles"
+            " WHERE dictionary_id = ? AND start_offset = ?",
+            (self.dictionary_id, key.start))
+        return rows[0][0].encode('utf-8') if rows else b''
+        
+    def resident_size(self):
+        """Обсяг пам'яті (байт): статті лишаються в базі."""
+        return sys.getsizeof(self)
+        
+class DatabasePrefixIndex:
+    """Клас, що шукає заголовні слова імпортованого словника за
+    початком слова.
+    
+    Ключі порівняння й сортування обчислюються під час імпорту,
+    а пошук — запит за діапазоном до індексів, які містять усі
+    потрібні стовпці, тож сама таблиця слів не читається."""
+    
+    def __init__(self, database, dictionary_id, headwords):
+        """Ініціалізація атрибутів."""
+        self.database = database
+        self.dictionary_id = dictionary_id
+        self.headwords = headwords
+        
+    def __len__(self):
+        return self.headwords
+        
+    def search(self, prefix):
+        """Пошук слів, що починаються з prefix (з розділовими
+        знаками чи без них), як у PrefixIndex.search."""
+        prefix = headword_match_key(prefix)
+        #Обидві умови шукаються за своїми індексами, а слово, що
+        #підходить під обидві, повертається лише раз
+        return self.database.query(
+            "SELECT collation_key, word, clean_key, match_key"
+            " FROM headwords WHERE dictionary_id = ?1"
+            " AND clean_key >= ?2 AND clean_key < ?3 UNION"
+            " SELECT collation_key, word, clean_key, match_key"
+            " FROM headwords WHERE dictionary_id = ?1"
+            " AND match_key >= ?2 AND match_key < ?3",
+            (self.dictionary_id, prefix, prefix + '\U0010ffff'))
+        
+    def resident_size(self):
+        """Обсяг пам'яті (байт): ключі лишаються в базі."""
+        return sys.getsizeof(self)
+        
+def open_dictionary_database():
+    """Відкриття бази даних словників лише для читання.
+    
+    Повертає None, якщо бази ще немає чи її не вдалося відкрити."""
+    try:
+        return DictionaryDatabase()
+    except sqlite3.Error:
+        return None
+        
+def import_dictionaries(paths, progress=None):
+    """Імпорт словників до бази даних.
+    
+    Теки з paths переглядаються рекурсивно, як і розташування
+    словників. Шляхи зберігаються абсолютними, тож словник
+    знаходиться в базі, хоч би звідки запущено імпорт. Повертає
+    перелік пар (шлях, назва словника або виняток, через який
+    імпорт не вдався)."""
+    database = DictionaryDatabase(readonly=False)
+    filepaths = []
+    for path in map(os.path.abspath, paths):
+        if os.path.isdir(path):
+            filepaths.extend(scan_dictionary_files([path]))
+        else:
+            filepaths.append(path)
+    results = []
+    try:
+        for filepath in filepaths:
+            try:
+                results.append((filepath,
+                    database.import_file(filepath, progress)))
+            except Exception as error:
+                results.append((filepath, error))
+    finally:
+        database.close()
+    return results
+    
\ No newline at end of file
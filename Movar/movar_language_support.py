@@ -184,6 +184,7 @@ class InterfaceLanguage:
                 'Paste': 'Вставити',
                 'Close menu': 'Закрити меню',
                 'No word': 'Словник не містить слова',
+                'No text': 'Немає статей з таким текстом',
                 'Processing dictionaries': 'Обробка словників',
                 'On/Off playing word':
                     'Увімкнути/Вимкнути вимову слів',
@@ -212,7 +213,15 @@ class InterfaceLanguage:
                 'Manual text': manual_text_uk,
                 'Web site': "Сторінка проєкту(GitHub)",
                 'Regex mistake': "Помилка у формулі Regex:\n",
-                'Regex mistake title': "Помилка в Regex"
+                'Regex mistake title': "Помилка в Regex",
+                'Parallel loading':
+                    'Паралельне завантаження словників',
+                'Title slow access': 'Повільний доступ до статей',
+                'Slow access':
+                    'Ці стиснуті словники не мають незалежних блоків,\n'
+                    'тож статті в них читаються від початку файла.\n'
+                    'Перетворіть їх командою «Movar.py --convert»\n'
+                    'або перестисніть «xz --block-size=4MiB»:\n',
                 },
                 
         'English':
@@ -259,6 +268,7 @@ class InterfaceLanguage:
                 'Paste': 'Paste',
                 'Close menu': 'Close menu',
                 'No word': "The dictionary doesn't contain the word",
+                'No text': 'No articles contain the text',
                 'Processing dictionaries': 'Processing dictionaries',
                 'On/Off playing word': 'On/Off word pronouncing',
                 'Transparency scale': 'Transparency scale of windows',
@@ -287,7 +297,14 @@ class InterfaceLanguage:
                 'Manual text': manual_text_en,
                 'Web site': "Project's website(GitHub)",
                 'Regex mistake': "Mistake in Regex formula:\n",
-                'Regex mistake title': "Regex mistake"
+                'Regex mistake title': "Regex mistake",
+                'Parallel loading': 'Parallel loading of dictionaries',
+                'Title slow access': 'Slow access to articles',
+                'Slow access':
+                    'These compressed dictionaries have no independent\n'
+                    'blocks, so their articles are read from the start.\n'
+                    'Convert them with "Movar.py --convert"\n'
+                    'or recompress with "xz --block-size=4MiB":\n',
                 },
                 
         '日本語':
@@ -334,6 +351,7 @@ class InterfaceLanguage:
                 'Paste': 'ペーストします',
                 'Close menu': 'メニューを閉めます',
                 'No word': "この言葉は辞書にありません - ",
+                'No text': "このテキストを含む記事はありません - ",
                 'Processing dictionaries': '辞書を処理している',
                 'On/Off playing word': '言葉を読むことは点けます(消します）',
                 'Transparency scale': '透徹のレベル',
@@ -362,6 +380,13 @@ class InterfaceLanguage:
                 'Manual text': manual_text_jp,
                 'Web site': "アプリのウェブサイト(GitHub)",
                 'Regex mistake': "「Regex」の式に誤りをしまいました:\n",
-                'Regex mistake title': "「Regex」の誤り"
+                'Regex mistake title': "「Regex」の誤り",
+                'Parallel loading': '辞書を並列に読み込みます',
+                'Title slow access': '記事へのアクセスが遅い',
+                'Slow access':
+                    'これらの圧縮辞書には独立したブロックがないので、\n'
+                    '記事はファイルの先頭から読み込まれます。\n'
+                    '「Movar.py --convert」で変換するか、\n'
+                    '「xz --block-size=4MiB」で再圧縮してください:\n',
                 },
         }
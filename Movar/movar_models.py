@@ -18,108 +18,2251 @@ along with Movar. If not, see <https://www.gnu.org/licenses/>.
 """
 
 import json
-from tkinter import messagebox
-from .movar_language_support import InterfaceLanguage
 from pathlib import Path
-import os, mmap, re, platform
-from threading import Thread, Lock
-from queue import Queue
+import os, mmap, re, platform, hashlib, bisect, unicodedata, time
+import ctypes, ctypes.util, select, struct, sys, shutil
+import gzip, bz2, lzma, zlib, html, io
+from contextlib import nullcontext
+from threading import Thread, Lock, Event
+from types import MappingProxyType
+from array import array
+from collections.abc import Mapping
+from itertools import accumulate
+from queue import Queue, Empty
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
 
-class TextSearch(Thread):
-    """Клас, де завантажуються словники та відбувається пошук по ним."""
+class DictionaryFormatError(Exception):
+    """Хибне внутрішнє форматування файла словника."""
+    
+class RegexFilterError(Exception):
+    """Помилка у формулі Regex словника."""
+    
+def is_dictionary_file(filename):
+    """Перевірка, чи файл є словником, який уміє читати Movar."""
+    return filename.endswith(".txt") or is_bundle_file(filename) or \
+        is_compressed_file(filename) or is_stardict_file(filename)
+        
+#Розширення стиснутих словників і відповідні їм модулі
+COMPRESSED_FORMATS = {'.txt.gz': gzip, '.txt.bz2': bz2, '.txt.xz': lzma}
+#Помилки, які здіймають модулі розпакування на пошкоджених файлах
+_DECOMPRESSION_ERRORS = (OSError, EOFError, lzma.LZMAError, zlib.error)
+
+def is_compressed_file(filename):
+    """Перевірка, чи файл є стиснутим текстовим словником."""
+    return filename.endswith(tuple(COMPRESSED_FORMATS))
+    
+def open_compressed_stream(filepath):
+    """Відкриття стиснутого словника для послідовного читання."""
+    for extension, module in COMPRESSED_FORMATS.items():
+        if filepath.endswith(extension):
+            return module.open(filepath, 'rb')
+    raise ValueError(filepath)
+    
+def dictionary_stem(filepath):
+    """Шлях до словника без розширення формату."""
+    for extension in (*COMPRESSED_FORMATS, '.txt', '.movar', '.ifo'):
+        if filepath.endswith(extension):
+            return filepath[:-len(extension)]
+    return filepath
+    
+def is_bundle_file(filename):
+    """Перевірка, чи файл є словником-пакунком Movar (.movar)."""
+    return filename.endswith(".movar")
+    
+def is_stardict_file(filename):
+    """Перевірка, чи файл є описом словника StarDict (.ifo)."""
+    return filename.endswith(".ifo")
+    
+def scan_dictionary_files(paths):
+    """Рекурсивний пошук файлів словників у теках.
+    
+    Повертає словник {шлях до файла: результат stat}, тож розміри
+    й час зміни файлів не доводиться запитувати вдруге. Кожен файл
+    і кожна тека обробляються лише раз, навіть якщо вони вказані
+    кілька разів (інакше записані чи через символьне посилання)."""
+    files = {}
+    seen_files = set()
+    seen_dirs = set()
+    pending_dirs = [path for path in paths if path]
+    while pending_dirs:
+        path = pending_dirs.pop(0)
+        real_path = os.path.realpath(path)
+        if real_path in seen_dirs:
+            continue
+        seen_dirs.add(real_path)
+        try:
+            with os.scandir(path) as entries:
+                entries = sorted(entries, key=lambda entry: entry.name)
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                if entry.is_dir():
+                    pending_dirs.append(entry.path)
+                elif is_dictionary_file(entry.name) and entry.is_file():
+                    real_path = os.path.realpath(entry.path)
+                    if real_path not in seen_files:
+                        seen_files.add(real_path)
+                        files[entry.path] = entry.stat()
+            except OSError:
+                continue
+    return files
+    
+def _parse_dictionary_header(header_lines, filepath):
+    """Назва й опис словника з чотирьох рядків заголовка."""
+    try:
+        dict_titles = dict(line.decode().strip().split(':')
+            for line in header_lines)
+        return dict_titles['#Title'], {
+            'Language pair': dict_titles['#Pair'],
+            'Description': dict_titles['#Description'],
+            'Regex filter': dict_titles['#Regex filter'],
+            'File path': filepath,
+            }
+    except Exception:
+        raise DictionaryFormatError(os.path.basename(filepath))
+        
+def read_dictionary_header(filepath):
+    """Читання лише заголовка словника без його тіла."""
+    if is_bundle_file(filepath):
+        return read_bundle_header(filepath)
+    if is_stardict_file(filepath):
+        return read_stardict_header(filepath)
+    if is_compressed_file(filepath):
+        try:
+            with open_compressed_stream(filepath) as stream:
+                header_lines = [stream.readline() for i in range(4)]
+        except _DECOMPRESSION_ERRORS:
+            raise DictionaryFormatError(os.path.basename(filepath))
+        return _parse_dictionary_header(header_lines, filepath)
+    with open(filepath, 'rb') as file:
+        return _parse_dictionary_header(
+            [file.readline() for i in range(4)], filepath)
+    
+def _report_progress(progress, event, filepath, **values):
+    """Надсилання події завантаження, якщо є кому її отримати."""
+    if progress:
+        progress({'event': event, 'file': filepath, **values})
+        
+#Розмір частини тіла словника, що індексується за один раз
+INDEX_CHUNK_SIZE = 4 * 1024 * 1024
+#Запас рядків після частини для збігів, що перетинають її межу
+INDEX_CHUNK_OVERLAP = 64 * 1024
+
+#Конструкції, значення яких для байтів і для тексту різне
+_UNICODE_SENSITIVE_REGEX = re.compile(r'\\[wWbBdDsS]|\.|\[\^|\(\?[a-zA-Z]*i')
+
+def _ascii_literals(parsed):
+    """Чи всі символи, які згадано в розібраному шаблоні, — ASCII.
+    
+    Перевіряються окремі символи й межі діапазонів, зокрема задані
+    екрануванням (\\u0430, \\xe9, \\351, \\N{...}), у всіх вкладених
+    групах і класах символів."""
+    for op, value in parsed:
+        if op in (re._constants.LITERAL, re._constants.NOT_LITERAL):
+            if value >= 0x80:
+                return False
+        elif op is re._constants.RANGE:
+            if value[1] >= 0x80:
+                return False
+        elif op is re._constants.IN:
+            if not _ascii_literals(value):
+                return False
+        elif isinstance(value, tuple):
+            #Вкладені шаблони груп, повторень і перевірок, а також
+            #списки шаблонів альтернатив
+            for item in value:
+                nested = item if isinstance(item, list) else [item]
+                for subpattern in nested:
+                    if isinstance(subpattern, re._parser.SubPattern) \
+                        and not _ascii_literals(subpattern):
+                        return False
+    return True
+    
+def _compile_bytes_filter(word_filter):
+    """Компіляція фільтра заголовних слів як шаблону для байтів.
+    
+    Це можливо лише тоді, коли шаблон знаходить ті самі слова і в
+    байтах UTF-8, і в декодованому тексті: він складається із
+    символів ASCII, усі символи, які він згадує (також через
+    екранування), — ASCII, і він не містить класів символів, що
+    залежать від Unicode. Інакше повертається None."""
+    if not word_filter.isascii() or \
+        _UNICODE_SENSITIVE_REGEX.search(word_filter):
+        return None
+    try:
+        parsed = re._parser.parse(word_filter)
+    except re.error:
+        return None
+    if not _ascii_literals(parsed):
+        return None
+    return re.compile(word_filter.encode('ascii'), re.M)
+    
+def _line_end(body, position):
+    """Позиція відразу після кінця рядка, на який припадає position."""
+    if position >= len(body):
+        return len(body)
+    newline = body.find(b'\n', position)
+    return len(body) if newline < 0 else newline + 1
+    
+def _scan_chunk(word_filter, chunk, position, end, found):
+    """Пошук заголовних слів в одній частині тіла словника.
+    
+    chunk починається з початку рядка, а слова шукаються від
+    position, доки збіг починається раніше за end (обидві позиції —
+    у байтах від початку chunk). Пари (слово, зміщення в chunk)
+    додаються до found. Повертає позицію, з якої слід продовжити."""
+    bytes_pattern, text_pattern = word_filter
+    next_position = end
+    if bytes_pattern:
+        for match in bytes_pattern.finditer(chunk, position):
+            if match.start() >= end:
+                break
+            found.append((match.group().decode('utf-8'), match.start()))
+            next_position = max(next_position, match.end())
+        return next_position
+    text = chunk.decode('utf-8')
+    ascii_only = len(text) == len(chunk)
+    char_pos = position
+    if not ascii_only:
+        char_pos = len(chunk[:position].decode('utf-8'))
+    byte_pos, last_char = 0, 0
+    for match in text_pattern.finditer(text, char_pos):
+        if ascii_only:
+            match_start = match.start()
+        else:
+            byte_pos += len(text[last_char:match.start()].encode('utf-8'))
+            last_char = match.start()
+            match_start = byte_pos
+        if match_start >= end:
+            break
+        found.append((match.group(), match_start))
+        next_position = max(next_position,
+            match_start + len(match.group().encode('utf-8')))
+    return next_position
+    
+def _compile_word_filter(word_filter):
+    """Шаблони фільтра заголовних слів для байтів і для тексту."""
+    return _compile_bytes_filter(word_filter), \
+        re.compile(word_filter, re.M)
+        
+def iter_headword_matches(word_filter, body, body_offset=0,
+    chunk_size=INDEX_CHUNK_SIZE, progress=None):
+    """Пошук заголовних слів у тілі словника частинами.
+    
+    Тіло (mmap чи bytes) ніколи не декодується повністю: кожна
+    частина закінчується на межі рядка й сканується разом із запасом
+    наступних рядків, тож збіг, що перетинає межу частини, береться
+    один раз. Повертає пари (слово, зміщення в байтах від початку
+    файла) у порядку появи слів. Після кожної частини викликається
+    progress(зміщення, до якого тіло проіндексовано)."""
+    word_filter = _compile_word_filter(word_filter)
+    position = body_offset
+    while position < len(body):
+        #Частина починається з початку рядка, щоб "^" працював
+        line_start = max(body.rfind(b'\n', body_offset, position) + 1,
+            body_offset)
+        end = _line_end(body, position + chunk_size)
+        chunk = body[line_start:_line_end(body, end + INDEX_CHUNK_OVERLAP)]
+        found = []
+        position = line_start + _scan_chunk(word_filter, chunk,
+            position - line_start, end - line_start, found)
+        for word, start in found:
+            yield word, line_start + start
+        if progress:
+            progress(min(position, len(body)))
+            
+def iter_stream_headword_matches(word_filter, stream, body_offset=0,
+    chunk_size=INDEX_CHUNK_SIZE, progress=None):
+    """Пошук заголовних слів у потоці, наприклад, розпакованого
+    словника, за один прохід.
+    
+    Працює так само, як iter_headword_matches, але в пам'яті
+    тримається лише поточна частина потоку із запасом рядків."""
+    word_filter = _compile_word_filter(word_filter)
+    buffer, buffer_offset, position = b'', body_offset, 0
+    eof = False
+    while True:
+        while not eof and \
+            len(buffer) < position + chunk_size + INDEX_CHUNK_OVERLAP:
+            data = stream.read(chunk_size)
+            eof = not data
+            buffer += data
+        if position >= len(buffer):
+            return
+        end = _line_end(buffer, position + chunk_size)
+        found = []
+        position = _scan_chunk(word_filter,
+            buffer[:_line_end(buffer, end + INDEX_CHUNK_OVERLAP)],
+            position, end, found)
+        for word, start in found:
+            yield word, buffer_offset + start
+        if progress:
+            progress(buffer_offset + min(position, len(buffer)))
+        #Буфер завжди починається з початку рядка
+        line_start = buffer.rfind(b'\n', 0, position) + 1
+        buffer = buffer[line_start:]
+        buffer_offset += line_start
+        position -= line_start
+        
+def index_dictionary_body(word_filter, main_body, body_offset=0,
+    progress=None, filepath=None, source_position=None):
+    """Створення таблиці статей словника.
     
-    def __init__(self, queue=None, *args, **kwargs):
+    Кожному заголовному слову відповідають межі його статті: від
+    першої появи слова до першої появи наступного заголовного слова.
+    main_body — увесь файл (mmap чи bytes) або потік, прочитаний
+    до body_offset, з якого починається тіло словника. Межі
+    зберігаються в байтах від початку файла, щоб статтю можна було
+    прочитати без декодування всього словника.
+    
+    Хід індексування повідомляється подіями 'bytes read' з кількістю
+    прочитаних байтів файла; для потоку її повертає функція
+    source_position, бо потік читається зі стиснутого файла."""
+    def report_bytes(position):
+        if source_position is not None:
+            position = source_position()
+        _report_progress(progress, 'bytes read', filepath, bytes=position)
+        
+    if isinstance(main_body, (bytes, mmap.mmap)):
+        matches = iter_headword_matches(word_filter, main_body,
+            body_offset, progress=report_bytes)
+    else:
+        matches = iter_stream_headword_matches(word_filter, main_body,
+            body_offset, progress=report_bytes)
+    word_starts = {}
+    for word, start in matches:
+        word = word.lower()
+        if word not in word_starts:
+            word_starts[word] = start
+            if len(word_starts) % 10000 == 0:
+                _report_progress(progress, 'headwords indexed',
+                    filepath, headwords=len(word_starts))
+    _report_progress(progress, 'headwords indexed',
+        filepath, headwords=len(word_starts))
+            
+    body_size = len(main_body) \
+        if isinstance(main_body, (bytes, mmap.mmap)) else main_body.tell()
+    starts = list(word_starts.values())
+    ends = starts[1:] + [body_size]
+    return CompactIndex((word, (start, end))
+        for word, start, end in zip(word_starts, starts, ends))
+        
+class CompactIndex(Mapping):
+    """Компактна таблиця статей словника.
+    
+    Поводиться як словник {заголовне слово: (початок, кінець статті)},
+    але зберігає всі слова одним рядком байтів UTF-8, а межі слів
+    і статей — у масивах array('Q'). Слова впорядковані за байтами,
+    тож пошук відбувається двійковим поділом, і на кожне слово не
+    припадає жодного окремого об'єкта Python."""
+    
+    def __init__(self, spans=()):
+        """Ініціалізація атрибутів.
+        
+        spans — словник або пари (слово, (початок, кінець))."""
+        if isinstance(spans, Mapping):
+            spans = spans.items()
+        items = sorted((word.encode('utf-8'), start, end)
+            for word, (start, end) in spans)
+        self.words = b''.join(item[0] for item in items)
+        self.word_offsets = array('Q', accumulate(
+            (len(item[0]) for item in items), initial=0))
+        self.starts = array('Q', (item[1] for item in items))
+        self.ends = array('Q', (item[2] for item in items))
+        
+    def __len__(self):
+        return len(self.starts)
+        
+    def __iter__(self):
+        for i in range(len(self.starts)):
+            yield self.word(i)
+            
+    def word(self, i):
+        """Заголовне слово за його номером у таблиці."""
+        offsets = self.word_offsets
+        return self.words[offsets[i]:offsets[i + 1]].decode('utf-8')
+        
+    def __getitem__(self, word):
+        i = self._find(word)
+        if i < 0:
+            raise KeyError(word)
+        return self.starts[i], self.ends[i]
+        
+    def __contains__(self, word):
+        return self._find(word) >= 0
+        
+    def _find(self, word):
+        """Номер слова в таблиці або -1, якщо слова немає."""
+        if not isinstance(word, str):
+            return -1
+        key = word.encode('utf-8')
+        words, offsets = self.words, self.word_offsets
+        i = _bisect_blob(words, offsets, key, 0, len(self.starts))
+        if i < len(self.starts) and \
+            words[offsets[i]:offsets[i + 1]] == key:
+            return i
+        return -1
+        
+    def resident_size(self):
+        """Обсяг пам'яті (байт), який займає таблиця."""
+        return sys.getsizeof(self) + sys.getsizeof(self.words) + \
+            sys.getsizeof(self.word_offsets) + \
+            sys.getsizeof(self.starts) + sys.getsizeof(self.ends)
+            
+    def to_bytes(self):
+        """Перетворення таблиці на байти для кешу індексів."""
+        return struct.pack('QQ', len(self.starts), len(self.words)) + \
+            self.word_offsets.tobytes() + self.starts.tobytes() + \
+            self.ends.tobytes() + self.words
+            
+    @classmethod
+    def from_columns(cls, words, word_offsets, starts, ends):
+        """Таблиця з готових стовпців, наприклад, відображених
+        з файла-пакунка."""
+        index = cls()
+        index.words = words
+        index.word_offsets = word_offsets
+        index.starts = starts
+        index.ends = ends
+        return index
+        
+    @classmethod
+    def from_bytes(cls, data):
+        """Відновлення таблиці з байтів, створених to_bytes."""
+        count, words_size = struct.unpack_from('QQ', data)
+        index = cls()
+        position = struct.calcsize('QQ')
+        for name, length in (('word_offsets', count + 1),
+            ('starts', count), ('ends', count)):
+            column = array('Q')
+            column.frombytes(
+                data[position:position + length * column.itemsize])
+            setattr(index, name, column)
+            position += length * column.itemsize
+        index.words = bytes(data[position:position + words_size])
+        if len(index.words) != words_size or \
+            len(index.ends) != count:
+            raise ValueError('Truncated index')
+        return index
+    
+def _bisect_blob(words, offsets, key, low, high):
+    """Двійковий пошук у відсортованих словах, записаних одним
+    рядком байтів з окремими межами (offsets).
+    
+    Повертає перший номер слова, не меншого за key."""
+    while low < high:
+        middle = (low + high) // 2
+        if words[offsets[middle]:offsets[middle + 1]] < key:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+    
+def open_dictionary_body(filepath, layout=None):
+    """Відкриття тіла словника для читання статей.
+    
+    У режимі відображення файла в пам'ять (mmap) файл лишається
+    відкритим упродовж сеансу, а в пам'ять потрапляють лише ті
+    сторінки, статті з яких було показано. Стиснуті словники
+    читаються через кеш розпакованих блоків; layout — будова
+    стиснутого файла, з'ясована під час індексування."""
+    if is_stardict_file(filepath):
+        dict_path = _stardict_companion(filepath, ('.dict.dz', '.dict'))
+        if dict_path.endswith('.dz'):
+            return CompressedBody(dict_path, gzip)
+        return open_dictionary_body(dict_path)
+    if is_compressed_file(filepath):
+        return CompressedBody(filepath, layout=layout)
+    with open(filepath, 'rb') as file:
+        if SettingsModel.fields['memory mapped dictionaries']['value'] \
+            in (False, '0', 0):
+            return file.read()
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        
+class _DecompressionCursor:
+    """Положення в розпакованому потоці разом зі станом розпакування."""
+    
+    #Скільки стиснутих байтів передається розпакувальнику за раз
+    input_size = 64 * 1024
+    
+    def __init__(self, module, source, in_pos=0, out_pos=0,
+        decompressor=None):
         """Ініціалізація атрибутів."""
-        super().__init__(*args, **kwargs)
+        self.module = module
+        self.source = source
+        self.in_pos = in_pos
+        self.out_pos = out_pos
+        self.decompressor = decompressor or self._new_decompressor()
+        
+    def _new_decompressor(self):
+        """Розпакувальник для нового потоку (члена) у файлі."""
+        if self.module is gzip:
+            return zlib.decompressobj(wbits=31)
+        if self.module is bz2:
+            return bz2.BZ2Decompressor()
+        return lzma.LZMADecompressor()
+        
+    def can_copy(self):
+        """Чи можна зберегти стан розпакування посеред потоку."""
+        return self.module is gzip
+        
+    def copy(self):
+        """Копія курсора, яку можна просувати незалежно."""
+        return _DecompressionCursor(self.module, self.source,
+            self.in_pos, self.out_pos, self.decompressor.copy())
+            
+    def read(self, size, on_stream_start=None):
+        """Розпакування наступних size байтів (менше в кінці файла).
+        
+        on_stream_start викликається з новим курсором на початку
+        кожного наступного потоку у файлі: з цих місць розпакування
+        можна почати заново."""
+        parts = []
+        while size > 0:
+            if self.decompressor.eof:
+                self.in_pos -= len(self.decompressor.unused_data)
+                if self.in_pos >= len(self.source):
+                    break
+                self.decompressor = self._new_decompressor()
+                if on_stream_start:
+                    on_stream_start(_DecompressionCursor(self.module,
+                        self.source, self.in_pos, self.out_pos))
+            if self.module is gzip:
+                data = self.decompressor.unconsumed_tail
+                needs_input = not data
+            else:
+                data = b''
+                needs_input = self.decompressor.needs_input
+            if needs_input:
+                data = self.source[self.in_pos:self.in_pos + self.input_size]
+                if not data:
+                    break
+                self.in_pos += len(data)
+            output = self.decompressor.decompress(data, size)
+            parts.append(output)
+            size -= len(output)
+            self.out_pos += len(output)
+        return b''.join(parts)
+        
+#Бітові підписи початку блока й кінця потоку у форматі bz2
+_BZ2_BLOCK_MAGIC = 0x314159265359
+_BZ2_END_MAGIC = 0x177245385090
+
+def _find_bit_pattern(source, pattern, bits=48):
+    """Бітові зміщення всіх появ pattern (bits біт) у source."""
+    positions = []
+    mask = (1 << bits) - 1
+    for shift in range(8):
+        #Байти, повністю зайняті шаблоном за такого зсуву
+        window = (pattern << (64 - bits - shift)).to_bytes(8, 'big')
+        middle = window[1:bits // 8] if shift else window[:bits // 8]
+        first_byte = 1 if shift else 0
+        position = source.find(middle)
+        while position >= 0:
+            byte_start = position - first_byte
+            if byte_start >= 0:
+                value = int.from_bytes(
+                    source[byte_start:byte_start + 8].ljust(8, b'\0'), 'big')
+                if (value >> (64 - bits - shift)) & mask == pattern:
+                    positions.append(byte_start * 8 + shift)
+            position = source.find(middle, position + 1)
+    return sorted(positions)
+    
+def _decode_bz2_block(source, bit_start, bit_end):
+    """Розпакування одного блока bz2 з довільного бітового зміщення.
+    
+    Блок обгортається власним заголовком і кінцем потоку, тож стає
+    окремим коректним файлом bz2."""
+    byte_start, byte_end = bit_start // 8, (bit_end + 7) // 8
+    value = int.from_bytes(source[byte_start:byte_end], 'big')
+    length = bit_end - bit_start
+    block = (value >> ((byte_end * 8) - bit_end)) & ((1 << length) - 1)
+    #Контрольна сума блока йде відразу за його підписом
+    block_crc = (block >> (length - 80)) & 0xFFFFFFFF
+    stream = (((block << 48) | _BZ2_END_MAGIC) << 32) | block_crc
+    length += 80
+    stream <<= -length % 8
+    return bz2.decompress(
+        b'BZh9' + stream.to_bytes((length + 7) // 8, 'big'))
+        
+def _bz2_units(source):
+    """Незалежні блоки файла bz2: функції розпакування та розміри."""
+    block_starts = _find_bit_pattern(source, _BZ2_BLOCK_MAGIC)
+    boundaries = sorted(block_starts + \
+        _find_bit_pattern(source, _BZ2_END_MAGIC))
+    units = []
+    for bit_start in block_starts:
+        next_boundary = bisect.bisect_right(boundaries, bit_start)
+        if next_boundary == len(boundaries):
+            return None
+        units.append(lambda bit_start=bit_start,
+            bit_end=boundaries[next_boundary]:
+            _decode_bz2_block(source, bit_start, bit_end))
+    return units, [None] * len(units)
+    
+def _read_varint(data, position):
+    """Читання числа змінної довжини з індексу xz."""
+    value = shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, position
+            
+def _xz_units(source):
+    """Незалежні блоки файла xz за індексами його потоків."""
+    units, sizes = [], []
+    end = len(source)
+    while end > 0:
+        while end >= 4 and source[end - 4:end] == b'\0' * 4:
+            end -= 4
+        footer = source[end - 12:end]
+        if len(footer) < 12 or footer[10:12] != b'YZ':
+            return None
+        index_start = end - 12 - \
+            (int.from_bytes(footer[4:8], 'little') + 1) * 4
+        index = source[index_start:end - 12]
+        count, position = _read_varint(index, 1)
+        blocks = []
+        for i in range(count):
+            unpadded, position = _read_varint(index, position)
+            uncompressed, position = _read_varint(index, position)
+            blocks.append((unpadded + (-unpadded % 4), uncompressed))
+        stream_start = index_start - 12 - \
+            sum(padded for padded, _ in blocks)
+        header = source[stream_start:stream_start + 12]
+        if stream_start < 0 or not header.startswith(b'\xfd7zXZ\0'):
+            return None
+        stream_units = []
+        block_start = stream_start + 12
+        for padded, uncompressed in blocks:
+            stream_units.append(lambda header=header,
+                block_start=block_start, block_end=block_start + padded:
+                lzma.LZMADecompressor(lzma.FORMAT_XZ).decompress(
+                header + source[block_start:block_end]))
+            block_start += padded
+        units[:0] = stream_units
+        sizes[:0] = [uncompressed for _, uncompressed in blocks]
+        end = stream_start
+    if len(units) < 2:
+        return None
+    return units, sizes
+    
+def _dictzip_units(source):
+    """Незалежні частини файла dictzip за полем RA заголовка gzip.
+    
+    Програма dictzip стискає файл частинами однакового розміру
+    й записує стиснуті розміри частин у додаткове поле заголовка,
+    тож кожну частину можна розпакувати окремо."""
+    flags = source[3]
+    if source[:3] != b'\x1f\x8b\x08' or not flags & 4:
+        return None
+    extra_end = 12 + int.from_bytes(source[10:12], 'little')
+    position = 12
+    random_access = None
+    while position + 4 <= extra_end:
+        size = int.from_bytes(source[position + 2:position + 4], 'little')
+        if source[position:position + 2] == b'RA':
+            random_access = source[position + 4:position + 4 + size]
+        position += 4 + size
+    if random_access is None or len(random_access) < 6:
+        return None
+    chunk_length = int.from_bytes(random_access[2:4], 'little')
+    count = int.from_bytes(random_access[4:6], 'little')
+    position = extra_end
+    #Назва файла, коментар і контрольна сума заголовка
+    if flags & 8:
+        position = source.find(b'\0', position) + 1
+    if flags & 16:
+        position = source.find(b'\0', position) + 1
+    if flags & 2:
+        position += 2
+    units = []
+    for i in range(count):
+        size = int.from_bytes(random_access[6 + 2 * i:8 + 2 * i], 'little')
+        units.append(lambda start=position, end=position + size:
+            zlib.decompressobj(-zlib.MAX_WBITS).decompress(
+            source[start:end]))
+        position += size
+    if len(units) < 2:
+        return None
+    return units, [chunk_length] * (count - 1) + [None]
+    
+class CompressedBody:
+    """Тіло стиснутого словника (gzip, bz2, xz) з читанням довільних
+    фрагментів.
+    
+    Файли bz2, dictzip та багатоблокові xz складаються з блоків, які можна
+    розпакувати окремо, тож стаття розпаковується разом лише зі своїм
+    блоком. Для gzip через кожні checkpoint_blocks блоків по block_size
+    байтів запам'ятовується стан розпакування, тож розпакування
+    починається з найближчої попередньої точки, а не з початку файла.
+    Стан розпакування bz2 і xz скопіювати не можна, тому одноблокові
+    xz (і bz2, блоки якого не знайдено) читаються лише вперед: стаття,
+    що лежить перед останньою прочитаною, розпаковується від початку
+    потоку (див. sequential_only). Розпаковані блоки зберігаються
+    в кеші (до cache_size байтів) і витісняються від найдавніше
+    прочитаних."""
+    
+    block_size = 256 * 1024
+    checkpoint_blocks = 16
+    cache_size = 32 * 1024 * 1024
+    
+    def __init__(self, filepath, module=None, layout=None):
+        """Ініціалізація атрибутів.
+        
+        layout — будова файла, повернена методом layout, можливо,
+        в іншому процесі."""
+        with open(filepath, 'rb') as file:
+            self.source = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.module = module or next(module for extension, module
+            in COMPRESSED_FORMATS.items() if filepath.endswith(extension))
+        self.blocks = {}
+        self.lock = Lock()
+        self.units = None
+        try:
+            if self.module is bz2:
+                self.units = _bz2_units(self.source)
+            elif self.module is lzma:
+                self.units = _xz_units(self.source)
+            else:
+                self.units = _dictzip_units(self.source)
+        except (IndexError, ValueError):
+            self.units = None
+        if self.units:
+            self.units, self.unit_sizes = self.units
+            self.unit_offsets = [0]
+        self.checkpoints = [_DecompressionCursor(self.module, self.source)]
+        self.stream_starts = []
+        self.cursor = None
+        if layout:
+            self._apply_layout(layout)
+            
+    def _apply_layout(self, layout):
+        """Відновлення розмірів розпакованих блоків і початків потоків."""
+        if self.units:
+            for number, size in enumerate(
+                layout.get('unit sizes', [])[:len(self.units)]):
+                self.unit_sizes[number] = size
+        for in_pos, out_pos in layout.get('streams', []):
+            self._add_stream_start(_DecompressionCursor(
+                self.module, self.source, in_pos, out_pos))
+            
+    def layout(self):
+        """Будова файла, з'ясована під час читання: розміри
+        розпакованих блоків і початки потоків.
+        
+        На відміну від стану розпакування, її можна передати іншому
+        процесу й зберегти в кеші індексів."""
+        layout = {'streams': list(self.stream_starts)}
+        if self.units:
+            layout['unit sizes'] = [end - start for start, end
+                in zip(self.unit_offsets, self.unit_offsets[1:])]
+        return layout
+        
+    def stream(self):
+        """Потік для послідовного читання розпакованого файла.
+        
+        Під час читання з'ясовуються розміри блоків і запам'ятовуються
+        точки розпакування, тож статті згодом читаються без
+        розпакування файла від початку."""
+        return io.BufferedReader(_CompressedBodyStream(self))
+        
+    def sequential_only(self):
+        """Чи немає у файлі точок, з яких можна почати розпакування.
+        
+        Такий файл (наприклад, xz з одного блока) доводиться
+        розпаковувати від початку потоку щоразу, коли потрібна стаття
+        лежить перед останньою прочитаною."""
+        return not self.units and not self.checkpoints[0].can_copy()
+            
+    def prepare(self):
+        """Розстановка точок розпакування файла gzip наперед.
+        
+        Стан розпакування zlib не передається між процесами, тож для
+        файлів без незалежних блоків точки розставляються одним
+        читанням файла, а не під час першого пошуку статті."""
+        if self.units or not self.checkpoints[0].can_copy():
+            return
+        with self.stream() as stream:
+            while stream.read(self.block_size * self.checkpoint_blocks):
+                pass
+                
+    def __getitem__(self, key):
+        """Фрагмент розпакованого файла: body[start:end]."""
+        start, end, _ = key.indices(sys.maxsize)
+        if start >= end:
+            return b''
+        with self.lock:
+            if self.units:
+                try:
+                    return self._read_units(start, end)
+                except _DECOMPRESSION_ERRORS:
+                    #Хибно знайдений блок: читання по порядку
+                    self.units = None
+                    self.blocks = {}
+            first_block = start // self.block_size
+            last_block = (end - 1) // self.block_size
+            data = b''.join(self._block(number)
+                for number in range(first_block, last_block + 1))
+        offset = first_block * self.block_size
+        return data[start - offset:end - offset]
+        
+    def _read_units(self, start, end):
+        """Читання фрагмента з незалежних блоків файла."""
+        parts = []
+        position = start
+        while position < end:
+            #Межі блоків, розміри яких невідомі, з'ясовуються по черзі
+            while self.unit_offsets[-1] <= position and \
+                len(self.unit_offsets) <= len(self.units):
+                number = len(self.unit_offsets) - 1
+                size = self.unit_sizes[number]
+                if size is None:
+                    size = len(self._cached(('unit', number),
+                        self.units[number]))
+                self.unit_offsets.append(self.unit_offsets[-1] + size)
+            if position >= self.unit_offsets[-1]:
+                break
+            number = bisect.bisect_right(self.unit_offsets, position) - 1
+            data = self._cached(('unit', number), self.units[number])
+            unit_start = self.unit_offsets[number]
+            parts.append(data[position - unit_start:end - unit_start])
+            position = unit_start + len(data)
+        return b''.join(parts)
+        
+    def _block(self, number):
+        """Розпакований блок із кешу або з найближчої точки."""
+        if number in self.blocks:
+            return self._cached(number, None)
+        position = number * self.block_size
+        cursor = max((checkpoint for checkpoint in self.checkpoints
+            if checkpoint.out_pos <= position),
+            key=lambda checkpoint: checkpoint.out_pos)
+        if self.cursor is not None and \
+            cursor.out_pos <= self.cursor.out_pos <= position:
+            cursor = self.cursor
+        else:
+            cursor = cursor.copy() if cursor.can_copy() else \
+                _DecompressionCursor(cursor.module, self.source,
+                cursor.in_pos, cursor.out_pos)
+        data = b''
+        while True:
+            block_start = cursor.out_pos
+            self._save_checkpoint(cursor)
+            size = self.block_size - block_start % self.block_size
+            data = cursor.read(size, self._add_stream_start)
+            if block_start % self.block_size == 0:
+                self._cached(block_start // self.block_size,
+                    lambda: data)
+            if block_start // self.block_size == number or \
+                len(data) < size:
+                break
+        self.cursor = cursor
+        return data if block_start == position else b''
+        
+    def _save_checkpoint(self, cursor):
+        """Запам'ятовування стану розпакування на початку кожних
+        checkpoint_blocks блоків."""
+        if cursor.can_copy() and cursor.out_pos % \
+            (self.block_size * self.checkpoint_blocks) == 0 and \
+            all(checkpoint.out_pos != cursor.out_pos
+            for checkpoint in self.checkpoints):
+            self.checkpoints.append(cursor.copy())
+            
+    def _add_stream_start(self, cursor):
+        """Запам'ятовування початку наступного потоку у файлі."""
+        if all(checkpoint.out_pos != cursor.out_pos
+            for checkpoint in self.checkpoints):
+            self.checkpoints.append(cursor)
+            self.stream_starts.append([cursor.in_pos, cursor.out_pos])
+            
+    def _cached(self, key, decode):
+        """Блок із кешу; відсутній блок розпаковується функцією decode.
+        
+        Щойно прочитаний блок переноситься в кінець кешу, а з початку
+        витісняються найдавніше прочитані."""
+        if key in self.blocks:
+            self.blocks[key] = self.blocks.pop(key)
+            return self.blocks[key]
+        data = decode()
+        self.blocks[key] = data
+        while len(self.blocks) > 1 and \
+            sum(map(len, self.blocks.values())) > self.cache_size:
+            del self.blocks[next(iter(self.blocks))]
+        return data
+        
+    def resident_size(self):
+        """Обсяг пам'яті (байт), який займають кеш блоків і точки
+        розпакування (вікно zlib — до 32 КБ на точку)."""
+        return sum(len(data) for data in self.blocks.values()) + \
+            len(self.checkpoints) * 48 * 1024
+            
+class _CompressedBodyStream(io.RawIOBase):
+    """Послідовне читання тіла стиснутого словника від початку.
+    
+    Розміри прочитаних блоків і точки розпакування записуються до
+    CompressedBody так само, як під час читання статей."""
+    
+    def __init__(self, body):
+        """Ініціалізація атрибутів."""
+        super().__init__()
+        self.body = body
+        self.position = 0
+        self.unit = 0
+        self.pending = b''
+        self.cursor = None
+        if not body.units:
+            self.cursor = _DecompressionCursor(body.module, body.source)
+            
+    def readable(self):
+        return True
+        
+    def tell(self):
+        return self.position
+        
+    def source_position(self):
+        """Скільки байтів стиснутого файла вже прочитано."""
+        if self.cursor is not None:
+            return self.cursor.in_pos
+        return len(self.body.source) * self.unit // len(self.body.units)
+        
+    def readinto(self, buffer):
+        with self.body.lock:
+            if self.cursor is None:
+                try:
+                    data = self._read_unit(len(buffer))
+                except _DECOMPRESSION_ERRORS:
+                    #Хибно знайдений блок: читання по порядку
+                    self.body.units = None
+                    self.body.blocks = {}
+                    self._start_cursor()
+            if self.cursor is not None:
+                data = self._read_cursor(len(buffer))
+        buffer[:len(data)] = data
+        self.position += len(data)
+        return len(data)
+        
+    def _read_unit(self, size):
+        """Наступні байти з незалежних блоків файла."""
+        body = self.body
+        while not self.pending:
+            if self.unit == len(body.units):
+                return b''
+            data = body.units[self.unit]()
+            if len(body.unit_offsets) == self.unit + 1:
+                body.unit_offsets.append(body.unit_offsets[-1] + len(data))
+            self.unit += 1
+            self.pending = memoryview(data)
+        data, self.pending = self.pending[:size], self.pending[size:]
+        return data
+        
+    def _read_cursor(self, size):
+        """Наступні байти з розпакування по порядку.
+        
+        Читання не переходить межу checkpoint_blocks блоків, щоб
+        на кожній такій межі запам'ятати стан розпакування."""
+        body = self.body
+        interval = body.block_size * body.checkpoint_blocks
+        body._save_checkpoint(self.cursor)
+        size = min(size, interval - self.cursor.out_pos % interval)
+        data = self.cursor.read(size, body._add_stream_start)
+        if len(data) < size and not self.cursor.decompressor.eof:
+            raise EOFError('Compressed file ended before the '
+                'end-of-stream marker was reached')
+        return data
+        
+    def _start_cursor(self):
+        """Перехід до розпакування по порядку з поточного місця."""
+        self.cursor = _DecompressionCursor(self.body.module,
+            self.body.source)
+        self.pending = b''
+        skip = self.position
+        while skip > 0:
+            data = self._read_cursor(min(skip, INDEX_CHUNK_SIZE))
+            if not data:
+                break
+            skip -= len(data)
+            
+def read_article(dict_data, start, end):
+    """Декодування однієї статті словника."""
+    if 'Article types' in dict_data:
+        return format_stardict_article(dict_data['Main body'][start:end],
+            dict_data['Article types'])
+    return dict_data['Main body'][start:end].decode(
+        encoding='utf-8', errors='replace')
+    
+def index_resident_size(index_dict):
+    """Приблизний обсяг пам'яті (байт), який займає індекс статей."""
+    if hasattr(index_dict, 'resident_size'):
+        return index_dict.resident_size()
+    size = sys.getsizeof(index_dict)
+    for word, span in index_dict.items():
+        size += sys.getsizeof(word) + sys.getsizeof(span) + \
+            sys.getsizeof(span[0]) + sys.getsizeof(span[1])
+    return size
+    
+def dictionary_resident_size(dict_data):
+    """Приблизний обсяг пам'яті (байт), який займає словник.
+    
+    Тіло, відображене в пам'ять (mmap), не враховується: його
+    сторінки система звільняє сама, без запису на диск."""
+    size = index_resident_size(dict_data['Indexes']) + \
+        dict_data['Prefix index'].resident_size()
+    if isinstance(dict_data['Main body'], bytes):
+        size += sys.getsizeof(dict_data['Main body'])
+    elif hasattr(dict_data['Main body'], 'resident_size'):
+        size += dict_data['Main body'].resident_size()
+    return size
+    
+def load_dictionary_file(filepath, progress=None):
+    """Завантаження та індексування одного файла словника.
+    
+    Функція може виконуватися в окремому процесі, тому не змінює
+    жодного спільного стану, а повертає назву й дані словника.
+    Тіло словника відкривається окремо функцією open_dictionary_body.
+    Про хід завантаження повідомляється через виклики progress."""
+    filename = os.path.basename(filepath)
+    _report_progress(progress, 'file started', filepath,
+        size=os.path.getsize(filepath))
+    if is_bundle_file(filepath):
+        return open_dictionary_bundle(filepath)
+    index_cache = IndexCache()
+    if is_stardict_file(filepath):
+        title, dict_data = read_stardict_header(filepath)
+        cache_key = index_cache.stardict_key(filepath)
+        cached = index_cache.load(cache_key)
+        if cached is None:
+            index_dict = read_stardict_index(filepath,
+                dict_data['Offset bits'])
+            prefix_tables = build_prefix_tables(index_dict,
+                is_ukrainian_pair(dict_data['Language pair']))
+            index_cache.save(cache_key, index_dict, prefix_tables)
+        else:
+            index_dict, prefix_tables, _ = cached
+        dict_data['Indexes'] = index_dict
+        _report_progress(progress, 'headwords indexed',
+            filepath, headwords=len(index_dict))
+        dict_data['Prefix index'] = PrefixIndex(index_dict, *prefix_tables)
+        return title, dict_data
+    with (open(filepath, 'rb') as file):
+        with mmap.mmap(file.fileno(), 0,
+            access=mmap.ACCESS_READ) as mmap_obj:
+            #Стиснутий словник читається одним потоком: заголовок,
+            #а за ним тіло, яке одразу індексується. Заодно
+            #з'ясовується будова файла для швидкого читання статей
+            if is_compressed_file(filepath):
+                compressed_body = CompressedBody(filepath)
+                body_context = compressed_body.stream()
+                source_position = body_context.raw.source_position
+            else:
+                compressed_body = source_position = None
+                body_context = nullcontext(mmap_obj)
+            with body_context as body:
+                try:
+                    header_lines = [body.readline() for i in range(4)]
+                except _DECOMPRESSION_ERRORS:
+                    raise DictionaryFormatError(filename)
+                title, dict_data = _parse_dictionary_header(
+                    header_lines, filepath)
+                word_filter = dict_data['Regex filter'].rstrip()
+                cache_key = index_cache.file_key(
+                    filepath, mmap_obj, word_filter)
+                cached = index_cache.load(cache_key)
+                
+                if cached is None:
+                    try:
+                        index_dict = index_dictionary_body(
+                            word_filter, body, body.tell(),
+                            progress, filepath, source_position)
+                    except (UnicodeDecodeError, *_DECOMPRESSION_ERRORS):
+                        raise DictionaryFormatError(filename)
+                    except Exception:
+                        raise RegexFilterError(word_filter, filename)
+                    prefix_tables = build_prefix_tables(index_dict,
+                        is_ukrainian_pair(dict_data['Language pair']))
+                    body_layout = compressed_body.layout() \
+                        if compressed_body else None
+                    index_cache.save(cache_key, index_dict,
+                        prefix_tables, body_layout)
+                else:
+                    index_dict, prefix_tables, body_layout = cached
+                    
+    dict_data['Indexes'] = index_dict
+    if body_layout:
+        dict_data['Body layout'] = body_layout
+    #Таблиці пошуку за початком слова теж готуються тут, а не в
+    #потоці програми, що лише об'єднує завантажені словники
+    dict_data['Prefix index'] = PrefixIndex(index_dict, *prefix_tables)
+    return title, dict_data
+    
+def load_dictionary_file_isolated(filepath, progress=None,
+    load=load_dictionary_file):
+    """Завантаження словника з окремим звітом про результат.
+    
+    Функція не здіймає винятків: будь-яка помилка потрапляє до
+    звіту, тож зламаний файл не заважає завантаженню решти.
+    Словник читає функція load (типово з файла).
+    Повертає назву, дані словника (або None) та звіт."""
+    started = time.perf_counter()
+    report = {'status': 'loaded', 'error': None, 'error type': None,
+        'elapsed': 0.0, 'headwords': 0}
+    title = dict_data = None
+    try:
+        title, dict_data = load(filepath, progress)
+        report['headwords'] = len(dict_data['Indexes'])
+    except DictionaryFormatError as error:
+        report.update(status='failed', error=repr(error),
+            **{'error type': 'format'})
+    except RegexFilterError as error:
+        report.update(status='failed', error=error.args[0],
+            **{'error type': 'regex'})
+    except Exception as error:
+        report.update(status='failed', error=repr(error),
+            **{'error type': 'other'})
+    report['elapsed'] = time.perf_counter() - started
+    return title, dict_data, report
+    
+#Черга подій завантаження всередині процесу-виконавця
+_worker_progress_queue = None
+
+def _init_loading_worker(progress_queue):
+    """Підготовка процесу-виконавця до завантаження словників."""
+    global _worker_progress_queue
+    _worker_progress_queue = progress_queue
+    
+def _load_dictionary_file_in_worker(filepath):
+    """Завантаження словника в процесі-виконавці."""
+    return load_dictionary_file_isolated(
+        filepath, _worker_progress_queue.put)
+
+UKRAINIAN_ALPHABET = 'абвгґдеєжзиіїйклмнопрстуфхцчшщьюя'
+UKRAINIAN_COLLATION = {letter: chr(0xE000 + rank)
+    for rank, letter in enumerate(UKRAINIAN_ALPHABET)}
+UKRAINIAN_COLLATION['ʼ'] = ''
+_UKRAINIAN_COLLATION_TABLE = str.maketrans(UKRAINIAN_COLLATION)
+
+def is_ukrainian_pair(language_pair):
+    """Перевірка, чи слова словника українські."""
+    language = language_pair.split('-')[0].strip().lower()
+    return language.startswith(('укр', 'ukr')) or language == 'uk'
+    
+def headword_match_key(word, clean=False):
+    """Нормалізоване слово для порівняння з початком пошуку.
+    
+    Якщо clean=True, з ключа вилучаються розділові знаки."""
+    key = unicodedata.normalize('NFKC', word).casefold()
+    if clean:
+        key = re.sub(r'\W', '', key)
+    return key
+    
+def headword_collation_key(word, ukrainian=False):
+    """Ключ сортування слова.
+    
+    Для українських словників літери впорядковуються за українською
+    абеткою, для решти — за кодами Unicode після NFKC та casefold."""
+    key = headword_match_key(word, clean=True)
+    if ukrainian:
+        key = key.translate(_UKRAINIAN_COLLATION_TABLE)
+    return key
+    
+def _table_rows(ids):
+    """Рядок таблиці ключів для кожного номера слова."""
+    rows = array('Q', bytes(len(ids) * array('Q').itemsize))
+    for row, i in enumerate(ids):
+        rows[i] = row
+    return rows
+    
+def build_collation_table(headwords):
+    """Ключі сортування українських слів за номерами слів.
+    
+    Повертає рядок байтів UTF-8 з усіма ключами та межі ключів."""
+    keys = [headword_collation_key(word, ukrainian=True).encode('utf-8')
+        for word in headwords]
+    return b''.join(keys), array('Q', accumulate(map(len, keys), initial=0))
+    
+def build_prefix_tables(headwords, ukrainian=False):
+    """Відсортовані таблиці ключів для пошуку слів за початком.
+    
+    Для ключів без розділових знаків і для ключів як є повертається
+    по четвірці (ключі одним рядком байтів UTF-8, межі ключів, номери
+    слів у headwords, рядок таблиці для кожного номера слова).
+    Порядок байтів UTF-8 збігається з порядком рядків Python, тож
+    таблиці можна шукати двійковим поділом. Третя таблиця — ключі
+    сортування українських слів (build_collation_table) або None,
+    якщо ключ сортування збігається з ключем без розділових знаків."""
+    tables = []
+    for clean in (True, False):
+        keys = sorted((headword_match_key(word, clean).encode('utf-8'), i)
+            for i, word in enumerate(headwords))
+        ids = array('Q', (i for _, i in keys))
+        tables.append((b''.join(key for key, _ in keys),
+            array('Q', accumulate((len(key) for key, _ in keys),
+            initial=0)),
+            ids, _table_rows(ids)))
+    tables.append(build_collation_table(headwords) if ukrainian else None)
+    return tuple(tables)
+    
+def _prefix_tables_to_bytes(tables):
+    """Перетворення таблиць ключів на байти для кешу індексів."""
+    clean_table, match_table, collation_table = tables
+    data = b''
+    for keys, offsets, ids, rows in (clean_table, match_table):
+        data += struct.pack('QQ', len(ids), len(keys)) + \
+            offsets.tobytes() + ids.tobytes() + rows.tobytes() + keys
+    if collation_table is not None:
+        keys, offsets = collation_table
+        data += struct.pack('QQ', len(offsets) - 1, len(keys)) + \
+            offsets.tobytes() + keys
+    return data
+    
+def _prefix_tables_from_bytes(data):
+    """Відновлення таблиць ключів з байтів, створених
+    _prefix_tables_to_bytes."""
+    tables = []
+    position = 0
+    for lengths in ((1, 0, 0), (1, 0, 0), (1,)):
+        if len(tables) == 2 and position == len(data):
+            tables.append(None)
+            break
+        count, keys_size = struct.unpack_from('QQ', data, position)
+        position += struct.calcsize('QQ')
+        columns = []
+        for extra in lengths:
+            column = array('Q')
+            size = (count + extra) * column.itemsize
+            column.frombytes(data[position:position + size])
+            if len(column) != count + extra:
+                raise ValueError('Truncated prefix tables')
+            columns.append(column)
+            position += size
+        keys = bytes(data[position:position + keys_size])
+        position += keys_size
+        if len(keys) != keys_size:
+            raise ValueError('Truncated prefix tables')
+        tables.append((keys, *columns))
+    return tuple(tables)
+
+class PrefixIndex:
+    """Клас, що шукає заголовні слова словника за початком слова.
+    
+    Ключі порівняння (як є та без розділових знаків) зберігаються
+    у відсортованих таблицях: рядок байтів і масиви меж, номерів
+    слів та рядків для кожного номера, тож на слово не припадає
+    жодного окремого об'єкта Python. Так само за номерами слів
+    зберігаються ключі сортування українських слів. Таблиці
+    створюються під час індексування й зберігаються в кеші
+    індексів, а в пакунках .movar читаються прямо з відображеного
+    в пам'ять файла. Для знайдених слів ключі лише читаються
+    з таблиць, а не обчислюються наново."""
+    
+    def __init__(self, headwords, clean_table, match_table,
+        collation_table=None):
+        """Ініціалізація атрибутів.
+        
+        Таблиці ключів — четвірки (рядок байтів, межі ключів, номери
+        слів у headwords, рядки за номерами слів), таблиця ключів
+        сортування — пара (рядок байтів, межі ключів за номерами
+        слів) або None, якщо ключем сортування є ключ без розділових
+        знаків."""
+        self.headwords = headwords
+        self.clean_table = clean_table
+        self.match_table = match_table
+        self.collation_table = collation_table
+        
+    @classmethod
+    def build(cls, headwords, language_pair=''):
+        """Індекс, таблиці якого обчислюються з таблиці статей."""
+        if not isinstance(headwords, CompactIndex):
+            headwords = CompactIndex(headwords)
+        return cls(headwords, *build_prefix_tables(headwords,
+            is_ukrainian_pair(language_pair)))
+        
+    def __len__(self):
+        return len(self.headwords)
+        
+    @staticmethod
+    def _prefix_range(table, prefix):
+        """Межі рядків таблиці, ключі яких починаються з prefix."""
+        keys, offsets, ids, _ = table
+        start = _bisect_blob(keys, offsets, prefix.encode('utf-8'),
+            0, len(ids))
+        end = _bisect_blob(keys, offsets,
+            (prefix + '\U0010ffff').encode('utf-8'), start, len(ids))
+        return start, end
+        
+    @staticmethod
+    def _key(table, row):
+        """Ключ з рядка row таблиці ключів."""
+        keys, offsets = table[:2]
+        return keys[offsets[row]:offsets[row + 1]].decode('utf-8')
+        
+    def _entry(self, i):
+        """Кортеж (ключ сортування, слово, ключ порівняння без
+        розділових знаків, ключ порівняння) для слова з номером i."""
+        clean_key = self._key(self.clean_table, self.clean_table[3][i])
+        collation_key = clean_key if self.collation_table is None \
+            else self._key(self.collation_table, i)
+        return (collation_key, self.headwords.word(i), clean_key,
+            self._key(self.match_table, self.match_table[3][i]))
+        
+    def search(self, prefix):
+        """Пошук слів, що починаються з prefix (з розділовими
+        знаками чи без них).
+        
+        Повертає кортежі (ключ сортування, слово, ключ порівняння
+        без розділових знаків, ключ порівняння)."""
+        prefix = headword_match_key(prefix)
+        found = []
+        for table in (self.clean_table, self.match_table):
+            ids = table[2]
+            start, end = self._prefix_range(table, prefix)
+            found.extend(self._entry(ids[row]) for row in range(start, end))
+        return found
+        
+    def resident_size(self):
+        """Обсяг пам'яті (байт), який займають таблиці ключів.
+        
+        Самі слова належать індексу статей, а таблиці пакунка
+        лишаються у файлі, відображеному в пам'ять."""
+        tables = [self.clean_table, self.match_table]
+        if self.collation_table is not None:
+            tables.append(self.collation_table)
+        return sys.getsizeof(self) + sum(sys.getsizeof(part)
+            for table in tables for part in table
+            if not isinstance(part, (mmap.mmap, memoryview)))
+
+#Підпис і версія формату словників-пакунків .movar
+BUNDLE_MAGIC = b'MOVARDIC'
+BUNDLE_VERSION = 1
+#Підпис, версія, зміщення й розмір заголовка у форматі JSON
+_BUNDLE_PREAMBLE = struct.Struct('<8sIIQQ')
+
+#Розділи пакунка, що є стовпцями чисел
+_BUNDLE_COLUMNS = {'headword offsets', 'starts', 'ends', 'clean offsets',
+    'clean ids', 'clean rows', 'match offsets', 'match ids', 'match rows',
+    'collation offsets'}
+
+def _column_bytes(values):
+    """Стовпець чисел у вигляді байтів (uint64, little-endian)."""
+    column = array('Q', values)
+    if sys.byteorder == 'big':
+        column.byteswap()
+    return column.tobytes()
+    
+def _mapped_column(mmap_obj, offset, size):
+    """Стовпець чисел, записаний у файлі-пакунку.
+    
+    На little-endian системах стовпець читається прямо з
+    відображеного файла, без копіювання."""
+    if sys.byteorder == 'little':
+        return memoryview(mmap_obj)[offset:offset + size].cast('Q')
+    column = array('Q')
+    column.frombytes(mmap_obj[offset:offset + size])
+    column.byteswap()
+    return column
+    
+def _read_bundle_preamble(file, filepath):
+    """Заголовок словника-пакунка у вигляді словника."""
+    try:
+        magic, version, _, header_offset, header_size = \
+            _BUNDLE_PREAMBLE.unpack(file.read(_BUNDLE_PREAMBLE.size))
+        if magic != BUNDLE_MAGIC or version != BUNDLE_VERSION:
+            raise ValueError(magic, version)
+        file.seek(header_offset)
+        return json.loads(file.read(header_size))
+    except (ValueError, struct.error):
+        raise DictionaryFormatError(os.path.basename(filepath))
+        
+def read_bundle_header(filepath):
+    """Читання лише заголовка словника-пакунка."""
+    with open(filepath, 'rb') as file:
+        header = _read_bundle_preamble(file, filepath)
+    return header['Title'], {
+        'Language pair': header['Language pair'],
+        'Description': header['Description'],
+        'Regex filter': header['Regex filter'],
+        'File path': filepath,
+        }
+        
+def open_dictionary_bundle(filepath):
+    """Відкриття словника-пакунка .movar.
+    
+    Файл відображається в пам'ять, а таблиці слів і статей
+    читаються прямо з нього, тож час відкриття не залежить від
+    розміру словника."""
+    with open(filepath, 'rb') as file:
+        header = _read_bundle_preamble(file, filepath)
+        mmap_obj = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        columns = {name: _mapped_column(mmap_obj, offset, size)
+            for name, (offset, size) in header['Sections'].items()
+            if name in _BUNDLE_COLUMNS}
+        indexes = CompactIndex.from_columns(mmap_obj,
+            columns['headword offsets'], columns['starts'],
+            columns['ends'])
+        if len(indexes) != header['Headwords']:
+            raise ValueError('Truncated bundle')
+    except (KeyError, TypeError, ValueError):
+        raise DictionaryFormatError(os.path.basename(filepath))
+    title, dict_data = read_bundle_header(filepath)
+    dict_data['Indexes'] = indexes
+    dict_data['Main body'] = mmap_obj
+    #Пакунки, записані до появи рядків і ключів сортування за
+    #номерами слів, доповнюються ними під час відкриття
+    prefix_tables = []
+    for name in ('clean', 'match'):
+        ids = columns[f'{name} ids']
+        prefix_tables.append((mmap_obj, columns[f'{name} offsets'], ids,
+            columns.get(f'{name} rows') or _table_rows(ids)))
+    if 'collation offsets' in columns:
+        prefix_tables.append((mmap_obj, columns['collation offsets']))
+    elif is_ukrainian_pair(dict_data['Language pair']):
+        prefix_tables.append(build_collation_table(indexes))
+    dict_data['Prefix index'] = PrefixIndex(indexes, *prefix_tables)
+    return title, dict_data
+    
+def write_dictionary_bundle(bundle_path, title, dict_data, source,
+    body_offset):
+    """Запис словника-пакунка .movar.
+    
+    Пакунок складається з короткого вступу, відсортованої таблиці
+    заголовних слів, таблиць ключів для пошуку за початком слова,
+    тіла словника в UTF-8, меж статей та заголовка у форматі JSON.
+    Усі межі записуються в байтах від початку пакунка. source —
+    відкритий файл словника, тіло якого починається з body_offset."""
+    indexes = dict_data['Indexes']
+    if not isinstance(indexes, CompactIndex):
+        indexes = CompactIndex(indexes)
+    prefix_index = dict_data.get('Prefix index')
+    if isinstance(prefix_index, PrefixIndex) and \
+        prefix_index.headwords is indexes:
+        prefix_tables = prefix_index.clean_table, \
+            prefix_index.match_table, prefix_index.collation_table
+    else:
+        prefix_tables = build_prefix_tables(indexes,
+            is_ukrainian_pair(dict_data['Language pair']))
+    sections = {}
+    temp_path = f'{bundle_path}.{os.getpid()}.tmp'
+    
+    def write_section(fh, name, data):
+        #Кожен розділ вирівнюється на 8 байтів для читання стовпцями
+        fh.write(b'\0' * (-fh.tell() % 8))
+        sections[name] = [fh.tell(), len(data)]
+        fh.write(data)
+        
+    try:
+        with open(temp_path, 'wb') as fh:
+            fh.write(b'\0' * _BUNDLE_PREAMBLE.size)
+            words_offset = -fh.tell() % 8 + fh.tell()
+            write_section(fh, 'headwords', indexes.words)
+            write_section(fh, 'headword offsets', _column_bytes(
+                words_offset + offset for offset in indexes.word_offsets))
+            for name, (keys, offsets, ids, rows) in \
+                zip(('clean', 'match'), prefix_tables):
+                keys_offset = -fh.tell() % 8 + fh.tell()
+                write_section(fh, f'{name} keys', keys)
+                write_section(fh, f'{name} offsets', _column_bytes(
+                    keys_offset + offset for offset in offsets))
+                write_section(fh, f'{name} ids', _column_bytes(ids))
+                write_section(fh, f'{name} rows', _column_bytes(rows))
+            if prefix_tables[2] is not None:
+                keys, offsets = prefix_tables[2]
+                keys_offset = -fh.tell() % 8 + fh.tell()
+                write_section(fh, 'collation keys', keys)
+                write_section(fh, 'collation offsets', _column_bytes(
+                    keys_offset + offset for offset in offsets))
+            fh.write(b'\0' * (-fh.tell() % 8))
+            bundle_body_offset = fh.tell()
+            source.seek(body_offset)
+            shutil.copyfileobj(source, fh)
+            sections['body'] = [bundle_body_offset,
+                fh.tell() - bundle_body_offset]
+            shift = bundle_body_offset - body_offset
+            write_section(fh, 'starts',
+                _column_bytes(start + shift for start in indexes.starts))
+            write_section(fh, 'ends',
+                _column_bytes(end + shift for end in indexes.ends))
+            header = json.dumps({
+                'Title': title,
+                'Language pair': dict_data['Language pair'],
+                'Description': dict_data['Description'],
+                'Regex filter': dict_data['Regex filter'],
+                'Headwords': len(indexes),
+                'Sections': sections,
+                }, ensure_ascii=False).encode('utf-8')
+            header_offset = fh.tell()
+            fh.write(header)
+            fh.seek(0)
+            fh.write(_BUNDLE_PREAMBLE.pack(BUNDLE_MAGIC, BUNDLE_VERSION,
+                0, header_offset, len(header)))
+        os.replace(temp_path, bundle_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+            
+def convert_dictionary_to_bundle(filepath, bundle_path=None,
+    progress=None):
+    """Створення словника-пакунка .movar з текстового словника.
+    
+    Заголовні слова знаходяться за #Regex filter словника, як і під
+    час звичайного завантаження. Повертає шлях до пакунка."""
+    if is_stardict_file(filepath):
+        #Словники StarDict уже мають готовий індекс
+        raise DictionaryFormatError(os.path.basename(filepath))
+    if bundle_path is None:
+        bundle_path = dictionary_stem(filepath) + '.movar'
+    title, dict_data = load_dictionary_file(filepath, progress)
+    if is_compressed_file(filepath):
+        source_context = open_compressed_stream(filepath)
+    else:
+        source_context = open(filepath, 'rb')
+    with source_context as source:
+        for i in range(4):
+            source.readline()
+        write_dictionary_bundle(bundle_path, title, dict_data,
+            source, source.tell())
+    return bundle_path
+
+#Перший рядок кожного файла .ifo
+STARDICT_MAGIC = "StarDict's dict ifo file"
+#Типи полів статті StarDict, які містять розмітку
+_STARDICT_MARKUP_TYPES = 'hgx'
+_MARKUP_BREAK = re.compile(r'<br\s*/?>|</p>', re.IGNORECASE)
+_MARKUP_TAG = re.compile(r'<[^>]*>')
+
+def _strip_markup(text):
+    """Звичайний текст з розмітки HTML, Pango чи XDXF."""
+    text = _MARKUP_BREAK.sub('\n', text)
+    return html.unescape(_MARKUP_TAG.sub('', text))
+    
+#Файли словника StarDict, які лежать поруч з його .ifo
+STARDICT_COMPANIONS = ('.idx', '.idx.gz', '.dict', '.dict.dz')
+
+def stardict_info_file(filepath):
+    """Файл .ifo, якому належить файл словника StarDict (.idx,
+    .dict тощо), або None для інших файлів."""
+    for extension in STARDICT_COMPANIONS:
+        if filepath.endswith(extension):
+            return filepath[:-len(extension)] + '.ifo'
+    return None
+    
+def _stardict_companion(filepath, extensions):
+    """Файл словника StarDict поруч з .ifo з першим наявним
+    розширенням."""
+    stem = dictionary_stem(filepath)
+    for extension in extensions:
+        if os.path.exists(stem + extension):
+            return stem + extension
+    raise DictionaryFormatError(os.path.basename(stem + extensions[-1]))
+    
+def read_stardict_header(filepath):
+    """Назва й опис словника StarDict з файла .ifo.
+    
+    Мовну пару StarDict не зберігає, тож її замінює поле lang,
+    яке додають деякі упорядники, або назва формату."""
+    try:
+        with open(filepath, encoding='utf-8') as file:
+            lines = file.read().splitlines()
+        if lines[0].strip() != STARDICT_MAGIC:
+            raise ValueError(lines[0])
+        info = dict(line.strip().split('=', 1) for line in lines[1:]
+            if '=' in line)
+        return info['bookname'], {
+            'Language pair': info.get('lang', 'StarDict'),
+            'Description': _strip_markup(info.get('description', '')),
+            'Regex filter': '',
+            'File path': filepath,
+            'Article types': info.get('sametypesequence', ''),
+            'Offset bits': int(info.get('idxoffsetbits', 32)),
+            }
+    except Exception:
+        raise DictionaryFormatError(os.path.basename(filepath))
+        
+def read_stardict_index(filepath, offset_bits=32):
+    """Індекс статей словника StarDict з файла .idx (.idx.gz).
+    
+    Кожен запис файла — слово, нульовий байт, зсув і розмір статті
+    в файлі .dict. Для однакових у нижньому регістрі слів
+    залишається перша стаття, як і в текстових словниках."""
+    idx_path = _stardict_companion(filepath, ('.idx', '.idx.gz'))
+    try:
+        opener = gzip.open if idx_path.endswith('.gz') else open
+        with opener(idx_path, 'rb') as file:
+            data = file.read()
+        entry = struct.Struct('>QI' if offset_bits == 64 else '>II')
+        spans = {}
+        position = 0
+        while position < len(data):
+            word_end = data.index(b'\0', position)
+            offset, size = entry.unpack_from(data, word_end + 1)
+            word = data[position:word_end].decode('utf-8').lower()
+            if word not in spans:
+                spans[word] = (offset, offset + size)
+            position = word_end + 1 + entry.size
+    except (ValueError, struct.error, *_DECOMPRESSION_ERRORS):
+        raise DictionaryFormatError(os.path.basename(idx_path))
+    return CompactIndex(spans.items())
+    
+def format_stardict_article(data, types=''):
+    """Текст статті StarDict з її полів.
+    
+    Поле позначене літерою типу: малі літери — текст, що
+    закінчується нульовим байтом, великі — двійкові дані (звук,
+    зображення) з розміром попереду, які пропускаються. Якщо
+    в .ifo задано sametypesequence, літер типів у статті немає,
+    а останнє поле триває до кінця статті."""
+    fields = []
+    position = 0
+    number = 0
+    while position < len(data):
+        if types:
+            if number == len(types):
+                break
+            field_type = types[number]
+            last = number == len(types) - 1
+        else:
+            field_type = chr(data[position])
+            position += 1
+            last = False
+        number += 1
+        if field_type.isupper():
+            if last:
+                break
+            size = int.from_bytes(data[position:position + 4], 'big')
+            position += 4 + size
+            continue
+        field_end = len(data) if last else data.find(b'\0', position)
+        if field_end < 0:
+            field_end = len(data)
+        text = data[position:field_end].decode(
+            encoding='utf-8', errors='replace')
+        if field_type in _STARDICT_MARKUP_TYPES:
+            text = _strip_markup(text)
+        fields.append(text.strip())
+        position = field_end + 1
+    return '\n'.join(fields)
+    
+class AutocompleteSearch(Thread):
+    """Клас, що шукає варіанти автодоповнення у фоновому потоці.
+    
+    Запити, які встигли застаріти до початку чи під час пошуку,
+    відкидаються, тож до черги результатів потрапляє лише
+    найновіший перелік слів. Якщо новий запит лише подовжує
+    попередній, варіанти відбираються з попередніх результатів."""
+    
+    def __init__(self, queue, *args, **kwargs):
+        """Ініціалізація атрибутів."""
+        super().__init__(*args, daemon=True, **kwargs)
+        self.queue = queue
+        self.requests = Queue()
+        self.latest_query_id = 0
+        self.last_prefix = None
+        self.last_indexes = None
+        self.last_candidates = []
+        
+    def submit(self, prefix, indexes):
+        """Додавання нового запиту. Повертає його номер."""
+        self.latest_query_id += 1
+        self.requests.put((self.latest_query_id, prefix, indexes))
+        return self.latest_query_id
+        
+    def run(self):
+        while True:
+            request = self.requests.get()
+            while not self.requests.empty():
+                request = self.requests.get()
+            query_id, prefix, indexes = request
+            if query_id != self.latest_query_id:
+                continue
+            candidates = self.narrow(prefix, indexes)
+            if candidates is None:
+                candidates = self.search(prefix, indexes)
+            self.last_prefix = headword_match_key(prefix)
+            self.last_indexes = indexes
+            self.last_candidates = candidates
+            if query_id == self.latest_query_id:
+                data = [entry[1] for entry in candidates]
+                self.queue.put((query_id, prefix, data))
+                
+    def narrow(self, prefix, indexes):
+        """Відбір варіантів із результатів попереднього запиту.
+        
+        Повертає None, якщо новий запит не є продовженням
+        попереднього чи змінилася група словників."""
+        prefix = headword_match_key(prefix)
+        if indexes is not self.last_indexes or \
+            self.last_prefix is None or \
+            not prefix.startswith(self.last_prefix):
+            return None
+        return [entry for entry in self.last_candidates
+            if entry[2].startswith(prefix) or entry[3].startswith(prefix)]
+                
+    @staticmethod
+    def search(prefix, indexes):
+        """Пошук і сортування слів, що починаються з prefix.
+        
+        Повертає кортежі PrefixIndex.search без повторів слів."""
+        found_words = {}
+        for dic in indexes.keys():
+            for entry in indexes[dic].search(prefix):
+                found_words.setdefault(entry[1], entry)
+        return sorted(found_words.values())
+
+class TextSearch(Thread):
+    """Клас, де завантажуються словники та відбувається пошук по ним.
+    
+    Результат завантаження публікується через чергу як незмінний
+    знімок (snapshot) переліку словників. Під час першого
+    завантаження знімок надсилається після кожного словника, а під
+    час перезавантаження — лише один раз, коли всі словники готові,
+    тож до того пошук працює з попереднім знімком."""
+    
+    #Спільне блокування не дає двом завантаженням іти одночасно
+    dict_download_lock = Lock()
+    
+    def __init__(self, queue=None, snapshot=None, changed_files=(),
+        titles=None, database=None, failed_files=None, evicted=None,
+        *args, **kwargs):
+        """Ініціалізація атрибутів.
+        
+        Словники з snapshot уже завантажені, тож їхні файли
+        повторно не обробляються, крім змінених (changed_files).
+        Якщо задано titles, завантажуються лише словники з такими
+        назвами, а решта лишається тільки в переліку словників.
+        Словники, імпортовані до бази даних database і відтоді
+        не змінені, відкриваються з неї. Файли з failed_files
+        ({шлях: (розмір, час зміни)}), які не вдалося завантажити
+        раніше, пропускаються, доки не зміняться. Словники з назвами
+        з evicted, вивантажені через бюджет пам'яті, не завантажуються:
+        головне вікно повертає їх, коли вони знадобляться для пошуку."""
+        super().__init__(*args, daemon=True, **kwargs)
+        self.database = database
+        self.failed_files = dict(failed_files or {})
+        self.file_stats = {}
         self.path_to_dic = SettingsModel.fields['location']['value']
+        self.changed_files = set(changed_files)
+        self.titles = None if titles is None else set(titles)
+        self.evicted = set(evicted or ())
+        self.snapshot = MappingProxyType({key: dict_data
+            for key, dict_data in (snapshot or {}).items()
+            if dict_data['File path'] not in self.changed_files})
+        self.progressive = not self.snapshot
         self.total_dict = {}
+        self.load_report = {}
         self.queue = queue
-        self.dict_download_lock = Lock()
+        self.cancel_event = Event()
+        
+    def cancel(self):
+        """Скасування завантаження, наприклад, через новіше."""
+        self.cancel_event.set()
         
     def run(self):
+        #Подія 'done' надсилається й після непередбаченої помилки,
+        #інакше головне вікно чекало б завершення без кінця
         with self.dict_download_lock:
-            self.load_dictionaries()
-            self.queue.put('Done!')
-            return
-            
-    def _show_download_mistake(self, filename):
-        """Показати помилку при завантаженні."""
-        self.queue.put('Done!')
-        language = SettingsModel.fields['language']['value']
-        language_options = InterfaceLanguage().translation_options
-        title = language_options[language]\
-        ['Title dict download mistake']
-        message = language_options[language]\
-        ['Dict download mistake'] + filename + '!'
-        messagebox.showwarning(title, message)
-        
-    def _show_regex_formula_mistake(self, regex, filename):
-        """Показати помилку при завантаженні."""
-        self.queue.put('Done!')
-        language = SettingsModel.fields['language']['value']
-        language_options = InterfaceLanguage().translation_options
-        title = language_options[language]\
-        ['Regex mistake title']
-        message = language_options[language]\
-        ['Regex mistake'] + filename + '\n' + regex + '!'
-        messagebox.showwarning(title, message)
+            try:
+                if not self.cancel_event.is_set():
+                    self.load_dictionaries()
+            finally:
+                self.queue.put({'event': 'done',
+                    'cancelled': self.cancel_event.is_set()})
                    
     def load_dictionaries(self):
         """Завантаження словників."""
-        for path in self.path_to_dic.splitlines():
-            if path:
-                for filename in os.listdir(path):
-                    if filename.endswith(".txt"):
-                        with (open(os.path.join(path, filename), 'rb'
-                            ) as file):
-                            with mmap.mmap(file.fileno(), 0,
-                                access=mmap.ACCESS_READ) as mmap_obj:
-                                try:
-                                    dict_titles = \
-                                        dict(mmap_obj.readline().\
-                                        decode().strip().split(':')
-                                        for i in range(4))
-                                    
-                                    full_dict_temp = mmap_obj.read().\
-                                        decode(encoding='utf-8')
-                                    self.total_dict\
-                                    [dict_titles['#Title']]=\
-                                        {
-                                        'Language pair': \
-                                        dict_titles['#Pair'],
-                                        'Description': \
-                                        dict_titles['#Description'],
-                                        'Regex filter': \
-                                        dict_titles['#Regex filter'],
-                                        'Main body': full_dict_temp,
-                                        }
-                                except:
-                                    self._show_download_mistake(
-                                        filename)
-                                    return
-                        
-                for key in self.total_dict.keys():
-                    index_dict = {}
-                    word_filter = self.total_dict[key]\
-                        ['Regex filter'].rstrip()
-                    try:
-                        for match in re.finditer(word_filter,
-                            self.total_dict[key]['Main body'], re.M):
-                            word = match.group()
-                            word = word.lower()
-                            if word in index_dict.keys():
-                                new_span = (index_dict[word][0],
-                                    match.span()[1])
-                                index_dict[word] = new_span
-                            else:
-                                index_dict[word] = match.span()
-                    except:
-                        self._show_regex_formula_mistake(
-                            regex=word_filter, filename=filename)
-                        return
+        all_files = self._prefer_bundles(
+            scan_dictionary_files(self.path_to_dic.splitlines()))
+        self.file_stats = {filepath: (stat.st_size, stat.st_mtime_ns)
+            for filepath, stat in all_files.items()}
+        catalog = self._publish_catalog(all_files)
+        self.total_dict = {key: dict_data
+            for key, dict_data in self.snapshot.items()
+            if dict_data['File path'] in all_files}
+        loaded_files = {dict_data['File path']
+            for dict_data in self.total_dict.values()}
+        filepaths = [filepath for filepath in all_files
+            if filepath not in loaded_files and
+            (filepath in self.changed_files or
+            self.failed_files.get(filepath) != self.file_stats[filepath])]
+        if self.titles is not None:
+            requested_files = {catalog[title]['File path']
+                for title in self.titles if title in catalog}
+            filepaths = [filepath for filepath in filepaths
+                if filepath in requested_files]
+        evicted_files = {catalog[title]['File path']
+            for title in self.evicted if title in catalog}
+        filepaths = [filepath for filepath in filepaths
+            if filepath not in evicted_files]
+        self.queue.put({'event': 'loading started', 'files': filepaths,
+            'size': sum(all_files[filepath].st_size
+                for filepath in filepaths)})
                         
+        #Пакунки відкриваються миттєво, а відображення файла в пам'ять
+        #не можна передати з іншого процесу, тож вони йдуть першими.
+        #Так само миттєво відкриваються словники з бази даних
+        imported = {filepath for filepath in filepaths
+            if self.database is not None and
+            self.database.is_current(filepath, all_files[filepath])}
+        bundles = [filepath for filepath in filepaths
+            if is_bundle_file(filepath) or filepath in imported]
+        for filepath in bundles:
+            if self.cancel_event.is_set():
+                return
+            self._merge_loaded_dictionary(filepath,
+                load_dictionary_file_isolated, filepath, self.queue.put,
+                self.database.load_dictionary if filepath in imported
+                else load_dictionary_file)
+        filepaths = [filepath for filepath in filepaths
+            if not is_bundle_file(filepath) and filepath not in imported]
+        workers = self._count_loading_workers(len(filepaths))
+        remaining_files = filepaths
+        if workers > 1:
+            remaining_files = self._load_in_process_pool(filepaths, workers)
+        for filepath in remaining_files:
+            if self.cancel_event.is_set():
+                return
+            self._merge_loaded_dictionary(filepath,
+                load_dictionary_file_isolated, filepath,
+                self.queue.put)
+        if not self.cancel_event.is_set() and \
+            (not self.progressive or not filepaths + bundles):
+            self._publish_snapshot()
+            
+    @staticmethod
+    def _prefer_bundles(all_files):
+        """Вибір між пакунком .movar і текстовим словником з тією
+        самою назвою.
+        
+        Залишається пакунок, якщо він не старіший за текстовий
+        словник, інакше — лише новіший текстовий словник."""
+        sources = {}
+        for filepath, stat in all_files.items():
+            if not is_bundle_file(filepath):
+                stem = dictionary_stem(filepath)
+                sources[stem] = max(sources.get(stem, 0), stat.st_mtime_ns)
+        bundle_stems = {dictionary_stem(filepath)
+            for filepath, stat in all_files.items()
+            if is_bundle_file(filepath) and
+            stat.st_mtime_ns >= sources.get(dictionary_stem(filepath), 0)}
+        return {filepath: stat for filepath, stat in all_files.items()
+            if is_bundle_file(filepath) ==
+            (dictionary_stem(filepath) in bundle_stems)}
+        
+    def _publish_catalog(self, all_files):
+        """Надсилання переліку всіх наявних словників.
+        
+        Для переліку читаються лише заголовки файлів, тож він
+        з'являється задовго до завершення завантаження словників."""
+        catalog = {}
+        for filepath in all_files:
+            try:
+                title, header = read_dictionary_header(filepath)
+            except (DictionaryFormatError, OSError):
+                continue
+            catalog[title] = header
+        self.queue.put({'event': 'catalog',
+            'catalog': MappingProxyType(catalog)})
+        return catalog
+        
+    def _publish_snapshot(self):
+        """Надсилання незмінного знімка переліку словників."""
+        self.queue.put({'event': 'snapshot',
+            'snapshot': MappingProxyType(dict(self.total_dict))})
                     
-                    self.total_dict[key]['Indexes'] = index_dict
+    def _load_in_process_pool(self, filepaths, workers):
+        """Паралельне завантаження словників в окремих процесах.
+        
+        Події завантаження з процесів-виконавців пересилаються
+        до черги головного вікна, а готові словники додаються
+        в міру завершення їх обробки. Повертає файли, які процеси
+        не змогли обробити, бо не запустилися: їх завантажують у цьому
+        потоці. Файли, не завершені через аварію процесу-виконавця,
+        повторюються кожен в окремому процесі; якщо й там процес
+        аварійно завершується, файл вважається зламаним."""
+        executor = None
+        try:
+            context = get_context('spawn')
+            progress_queue = context.Queue()
+            executor = ProcessPoolExecutor(max_workers=workers,
+                mp_context=context, initializer=_init_loading_worker,
+                initargs=(progress_queue,))
+            pending = {executor.submit(
+                _load_dictionary_file_in_worker, filepath): filepath
+                for filepath in filepaths}
+        except (OSError, RuntimeError, BrokenProcessPool):
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+            return filepaths
+        broken_files = {}
+        try:
+            while pending and not self.cancel_event.is_set():
+                done, _ = wait(pending, timeout=0.1,
+                    return_when=FIRST_COMPLETED)
+                self._forward_progress_events(progress_queue)
+                for future in done:
+                    filepath = pending.pop(future)
+                    if len(filepaths) > 1 and \
+                        isinstance(future.exception(), BrokenProcessPool):
+                        broken_files[filepath] = future
+                    else:
+                        self._merge_loaded_dictionary(filepath,
+                            future.result)
+        finally:
+            #Під час скасування файли, що ще не почали оброблятися,
+            #знімаються з черги, тож чекати доводиться лише на поточні
+            executor.shutdown(cancel_futures=True)
+        #Будь-який із незавершених файлів міг обірвати роботу процесу,
+        #тож у цьому процесі вони не завантажуються
+        for filepath, future in broken_files.items():
+            if self.cancel_event.is_set():
+                break
+            if self._load_in_process_pool([filepath], 1):
+                self._merge_loaded_dictionary(filepath, future.result)
+        return []
+                        
+    def _forward_progress_events(self, progress_queue):
+        """Пересилання подій від процесів-виконавців."""
+        while True:
+            try:
+                self.queue.put(progress_queue.get_nowait())
+            except Empty:
+                return
+            
+    def _count_loading_workers(self, files_number):
+        """Кількість процесів для паралельного завантаження."""
+        if SettingsModel.fields['parallel loading']['value'] in \
+            (False, '0', 0):
+            return 1
+        workers = int(SettingsModel.fields['loading workers']['value'])
+        if workers <= 0:
+            workers = os.cpu_count() or 1
+        return min(workers, files_number)
+        
+    def _merge_loaded_dictionary(self, filepath, load, *args):
+        """Додавання завантаженого словника до загального переліку.
+        
+        Кожен файл обробляється окремо: помилка в одному словнику
+        потрапляє лише до його звіту в self.load_report. Помилки не
+        показуються звідси, бо це не головний потік: замість цього
+        до черги надсилається подія 'file failed'."""
+        started = time.perf_counter()
+        try:
+            title, dict_data, report = load(*args)
+        except Exception as error:
+            title, dict_data = None, None
+            report = {'status': 'failed', 'error': repr(error),
+                'error type': 'other', 'elapsed': 0.0, 'headwords': 0}
+        if report['status'] == 'loaded':
+            try:
+                #Пакунки .movar і словники з бази даних відкриваються
+                #разом з тілом та індексами
+                if 'Main body' not in dict_data:
+                    dict_data['Main body'] = open_dictionary_body(
+                        dict_data['File path'], dict_data.get('Body layout'))
+                    if isinstance(dict_data['Main body'], CompressedBody):
+                        dict_data['Main body'].prepare()
+                if 'Prefix index' not in dict_data:
+                    dict_data['Prefix index'] = PrefixIndex.build(
+                        dict_data['Indexes'], dict_data['Language pair'])
+            except Exception as error:
+                report.update(status='failed', error=repr(error),
+                    **{'error type': 'other'})
+        report['elapsed'] += time.perf_counter() - started
+        self.load_report[filepath] = report
+        
+        #Розмір файла надсилається й тут: подія 'file started' із
+        #процесу-виконавця може прийти пізніше
+        size = self.file_stats.get(filepath, (0,))[0]
+        if report['status'] == 'failed':
+            _report_progress(self.queue.put, 'file failed', filepath,
+                report=report, stat=self.file_stats.get(filepath),
+                size=size)
+            return False
+        self.total_dict[title] = dict_data
+        _report_progress(self.queue.put, 'file done', filepath,
+            title=title, report=report, size=size)
+        if self.progressive:
+            self._publish_snapshot()
+        return True
+
+class DictionaryWatcher(Thread):
+    """Клас, що стежить за змінами файлів словників у теках.
+    
+    На Linux використовується inotify, деінде — періодичне
+    порівняння розмірів і часу зміни файлів. Змінені, нові та
+    вилучені файли надсилаються до черги одним набором, щойно
+    зміни на якийсь час припиняться."""
+    
+    #Затримка (с), після якої накопичені зміни надсилаються
+    settle_time = 1.0
+    #Період (с) перевірки тек без inotify
+    poll_interval = 2.0
+    
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_IGNORED = 0x00008000
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = 0o4000
+    
+    def __init__(self, queue, paths, *args, **kwargs):
+        """Ініціалізація атрибутів."""
+        super().__init__(*args, daemon=True, **kwargs)
+        self.queue = queue
+        self.paths = [path for path in paths if path]
+        self.stop_event = Event()
+        
+    def stop(self):
+        """Припинення стеження."""
+        self.stop_event.set()
+        
+    def run(self):
+        inotify_fd = self._start_inotify()
+        if inotify_fd is None:
+            self._watch_by_polling()
+        else:
+            try:
+                self._watch_by_inotify(inotify_fd)
+            finally:
+                os.close(inotify_fd)
+                
+    def _start_inotify(self):
+        """Створення спостерігача inotify, якщо система його має."""
+        if platform.system() != 'Linux':
+            return None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'),
+                use_errno=True)
+            inotify_fd = libc.inotify_init1(self.IN_NONBLOCK)
+        except (OSError, AttributeError):
+            return None
+        if inotify_fd < 0:
+            return None
+        self.libc = libc
+        self.watched_dirs = {}
+        self.watched_real_dirs = set()
+        for path in self.paths:
+            self._add_inotify_watches(inotify_fd, path)
+        return inotify_fd
+        
+    def _add_inotify_watches(self, inotify_fd, path):
+        """Додавання до inotify теки разом з усіма її підтеками."""
+        mask = self.IN_MODIFY | self.IN_CLOSE_WRITE | \
+            self.IN_MOVED_FROM | self.IN_MOVED_TO | \
+            self.IN_CREATE | self.IN_DELETE
+        for dirpath, dirnames, _ in os.walk(path, followlinks=True):
+            real_path = os.path.realpath(dirpath)
+            if real_path in self.watched_real_dirs:
+                dirnames.clear()
+                continue
+            self.watched_real_dirs.add(real_path)
+            watch = self.libc.inotify_add_watch(
+                inotify_fd, os.fsencode(dirpath), mask)
+            if watch >= 0:
+                self.watched_dirs[watch] = dirpath
+        
+    def _watch_by_inotify(self, inotify_fd):
+        """Стеження за подіями inotify."""
+        changed = set()
+        while not self.stop_event.is_set():
+            timeout = self.settle_time if changed else 0.5
+            readable, _, _ = select.select([inotify_fd], [], [], timeout)
+            if not readable:
+                if changed:
+                    self.queue.put({'event': 'files changed',
+                        'files': changed})
+                    changed = set()
+                continue
+            try:
+                data = os.read(inotify_fd, 64 * 1024)
+            except BlockingIOError:
+                continue
+            position = 0
+            while position < len(data):
+                watch, event_mask, _, length = struct.unpack_from(
+                    'iIII', data, position)
+                position += struct.calcsize('iIII')
+                name = data[position:position + length].rstrip(b'\0')
+                position += length
+                if watch not in self.watched_dirs:
+                    continue
+                if event_mask & self.IN_IGNORED:
+                    #Теку вилучено, тож її можна буде додати знову
+                    dirpath = self.watched_dirs.pop(watch)
+                    self.watched_real_dirs.discard(
+                        os.path.realpath(dirpath))
+                    continue
+                filepath = os.path.join(
+                    self.watched_dirs[watch], os.fsdecode(name))
+                if event_mask & self.IN_ISDIR:
+                    #Нова чи перенесена тека: її файли з'являться
+                    #під час повторного пошуку словників
+                    if event_mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                        self._add_inotify_watches(inotify_fd, filepath)
+                    changed.add(filepath)
+                elif is_dictionary_file(filepath):
+                    changed.add(filepath)
+                elif stardict_info_file(filepath):
+                    #Зміна індексу чи тіла словника StarDict
+                    changed.add(stardict_info_file(filepath))
+                        
+    def _scan_files(self):
+        """Розміри й час зміни файлів словників у теках.
+        
+        Для словників StarDict враховуються й файли поруч з .ifo."""
+        files = {}
+        for filepath, stat in scan_dictionary_files(self.paths).items():
+            files[filepath] = [(stat.st_size, stat.st_mtime_ns)]
+            if is_stardict_file(filepath):
+                stem = dictionary_stem(filepath)
+                for extension in STARDICT_COMPANIONS:
+                    try:
+                        stat = os.stat(stem + extension)
+                    except OSError:
+                        continue
+                    files[filepath].append(
+                        (extension, stat.st_size, stat.st_mtime_ns))
+        return files
+        
+    def _watch_by_polling(self):
+        """Стеження через періодичне порівняння стану файлів."""
+        known_files = self._scan_files()
+        changed = set()
+        while not self.stop_event.wait(
+            self.settle_time if changed else self.poll_interval):
+            files = self._scan_files()
+            new_changes = {filepath
+                for filepath in known_files.keys() | files.keys()
+                if known_files.get(filepath) != files.get(filepath)}
+            known_files = files
+            if new_changes:
+                changed |= new_changes
+            elif changed:
+                self.queue.put({'event': 'files changed',
+                    'files': changed})
+                changed = set()
+
+class IndexCache:
+    """Клас, що зберігає індекси словників на диску між запусками."""
+    
+    version = 8
+    
+    def __init__(self):
+        """Ініціалізація атрибутів класу."""
+        dirname = 'movar_index_cache'
+        filedir = SettingsModel.config_dirs.get(
+            platform.system(), Path.home())
+        self.cache_dir = filedir/dirname
+        
+    #Розмір частини файла, що хешується за один раз
+    chunk_size = 16 * 1024 * 1024
+    
+    def file_key(self, filepath, mmap_obj, regex):
+        """Ключ, за яким перевіряється актуальність індексу словника.
+        
+        Хешування не повідомляє про прочитані байти: смуга
+        завантаження показує повільніше індексування тіла."""
+        stat = os.stat(filepath)
+        file_hash = hashlib.blake2b()
+        for start in range(0, len(mmap_obj), self.chunk_size):
+            file_hash.update(mmap_obj[start:start + self.chunk_size])
+        return {
+            'version': self.version,
+            'path': os.path.abspath(filepath),
+            'size': stat.st_size,
+            'mtime': stat.st_mtime_ns,
+            'hash': file_hash.hexdigest(),
+            'regex': regex,
+            }
+            
+    def stardict_key(self, filepath):
+        """Ключ актуальності індексу словника StarDict.
+        
+        Файл .idx не хешується: саме його читання кеш і заощаджує.
+        Тому ключ складається з розмірів і часу зміни файлів .ifo
+        та .idx (.idx.gz)."""
+        idx_path = _stardict_companion(filepath, ('.idx', '.idx.gz'))
+        ifo_stat, idx_stat = os.stat(filepath), os.stat(idx_path)
+        return {
+            'version': self.version,
+            'path': os.path.abspath(filepath),
+            'size': ifo_stat.st_size,
+            'mtime': ifo_stat.st_mtime_ns,
+            'index path': os.path.abspath(idx_path),
+            'index size': idx_stat.st_size,
+            'index mtime': idx_stat.st_mtime_ns,
+            }
+            
+    def _cache_path(self, cache_key):
+        """Шлях до файла з індексом конкретного словника."""
+        filename = hashlib.sha1(
+            cache_key['path'].encode()).hexdigest() + '.index'
+        return self.cache_dir/filename
+        
+    def load(self, cache_key):
+        """Завантаження індексу, якщо словник не змінювався.
+        
+        Файл кешу складається з ключа у форматі JSON в першому
+        рядку, а далі з розділів із розміром попереду: таблиці
+        CompactIndex, таблиць ключів PrefixIndex і будови стиснутого
+        файла (JSON). Разом з ключем записано хеш розділів:
+        пошкоджений файл не завантажується, а індекс створюється
+        наново. Повертає індекс статей, таблиці ключів і будову
+        файла."""
+        cache_path = self._cache_path(cache_key)
+        try:
+            with open(cache_path, 'rb') as fh:
+                cached_key = json.loads(fh.readline())
+                digest = cached_key.pop('digest', None)
+                if cached_key != cache_key:
+                    return None
+                data = fh.read()
+            if hashlib.blake2b(data).hexdigest() != digest:
+                return None
+            sections = []
+            position = 0
+            while position < len(data):
+                size, = struct.unpack_from('Q', data, position)
+                position += struct.calcsize('Q')
+                sections.append(data[position:position + size])
+                position += size
+            index_data, tables_data, layout_data = sections
+            return CompactIndex.from_bytes(index_data), \
+                _prefix_tables_from_bytes(tables_data), \
+                json.loads(layout_data)
+        except (OSError, ValueError, KeyError, TypeError, struct.error):
+            return None
+            
+    def save(self, cache_key, index_dict, prefix_tables, body_layout=None):
+        """Збереження індексу словника, таблиць ключів і будови
+        стиснутого файла до кешу."""
+        cache_path = self._cache_path(cache_key)
+        temp_path = cache_path.with_suffix(f'.{os.getpid()}.tmp')
+        if not isinstance(index_dict, CompactIndex):
+            index_dict = CompactIndex(index_dict)
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            data = b''.join(struct.pack('Q', len(section)) + section
+                for section in (index_dict.to_bytes(),
+                _prefix_tables_to_bytes(prefix_tables),
+                json.dumps(body_layout).encode()))
+            with open(temp_path, 'wb') as fh:
+                fh.write(json.dumps({**cache_key,
+                    'digest': hashlib.blake2b(data).hexdigest()}
+                    ).encode() + b'\n')
+                fh.write(data)
+            os.replace(temp_path, cache_path)
+        except OSError:
+            if temp_path.exists():
+                temp_path.unlink()
 
 class SettingsModel:
     """Клас, де встановлюються й запам'ятовуються налаштування."""
@@ -141,6 +2284,16 @@ class SettingsModel:
         'tts player': {'type': 'str', 'value': 'None'},
         'tts voice': {'type': 'str', 'value': 'None'},
         'initial dir': {'type': 'str', 'value': 'None'},
+        'parallel loading': {'type': 'bool', 'value': '1'},
+        'loading workers': {'type': 'int', 'value': '0'},
+        'memory mapped dictionaries': {'type': 'bool', 'value': '1'},
+        'autocomplete limit': {'type': 'int', 'value': '100'},
+        'watch dictionaries': {'type': 'bool', 'value': '1'},
+        'lazy loading': {'type': 'bool', 'value': '1'},
+        'background warming': {'type': 'bool', 'value': '1'},
+        'memory budget': {'type': 'int', 'value': '0'},
+        'dictionary database': {'type': 'bool', 'value': '0'},
+        'full text limit': {'type': 'int', 'value': '50'},
         }
         
     config_dirs = {
@@ -102,6 +102,10 @@ class GenericMenu(tk.Menu):
         self.sound_checkbutton_variable = tk.IntVar()
         self.sound_checkbutton_variable.set(
             self.settings['sound variable'].get())
+        #Змінна для ввімкнення паралельного завантаження словників
+        self.parallel_loading_variable = tk.IntVar()
+        self.parallel_loading_variable.set(
+            self.settings['parallel loading'].get())
         #Змінна для шкали прозорості
         self.transparency_scale_variable = tk.DoubleVar()
         self.transparency_scale_variable.set(
@@ -340,6 +344,8 @@ class GenericMenu(tk.Menu):
             translations[selected_language]['Manual text']
         self.website_label = \
             translations[selected_language]['Web site']
+        self.parallel_loading_label = \
+            translations[selected_language]['Parallel loading']
             
     def _dictionaries_settings_window(self, *_):
         """Відкриття вікна налаштування розташування словників."""
@@ -574,6 +580,7 @@ class GenericMenu(tk.Menu):
         
         self._add_font_family_choices()
         
+        self._add_button_on_off_parallel_loading()
         
     def _add_font_family_choices(self, *_):
         """Додавання меню вибору родини шрифтів."""
@@ -674,6 +681,16 @@ class GenericMenu(tk.Menu):
         self.sound_checkbutton.grid(row=0, column=0, sticky='sw')
         
         
+    def _add_button_on_off_parallel_loading(self, *_):
+        """Додавання кнопки паралельного завантаження словників."""
+        self.parallel_loading_checkbutton = ttk.Checkbutton(self.frame_3,
+            style="NewCheckbutton.TCheckbutton",
+            text=self.parallel_loading_label,
+            command=self._on_off_parallel_loading,
+            variable=self.parallel_loading_variable)
+        self.parallel_loading_checkbutton.grid(
+            row=3, column=1, sticky='sw')
+        
     def _ask_name_of_dict_group(self):
         """Вікно введення назви групи словників."""
         self.top_window = TopWindow()
@@ -914,6 +931,10 @@ class GenericMenu(tk.Menu):
         if active_dicts == '':
             self.total_dict_list.delete(0, tk.END)
         else:
+            for index, active_dict in reversed(
+                list(enumerate(all_active_dicts))):
+                if active_dict not in active_dicts.splitlines():
+                    self.total_dict_list.delete(index)
             for active_dict in active_dicts.splitlines():
                 if active_dict not in all_active_dicts:
                     self.total_dict_list.insert(0, active_dict)
@@ -940,6 +961,11 @@ class GenericMenu(tk.Menu):
         self.settings['sound variable'].set(
             self.sound_checkbutton_variable.get())
     
+    def _on_off_parallel_loading(self):
+        """Вмикання/вимикання паралельного завантаження словників."""
+        self.settings['parallel loading'].set(
+            self.parallel_loading_variable.get())
+    
     def _set_transparency_scale_variable(self, *_):
         """Встановлення значення прозорості вікон."""
         trans_var = f"{self.transparency_scale_variable.get():0.2f}"